@@ -12,31 +12,81 @@ Security Features:
 - Secure error handling
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.formparsers import MultiPartParser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import orjson
+# Light (no torch / Chroma) - parse workers import it anyway
+from pdf_loader import ScannedPDFError, load_pdf_chunks
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+from contextlib import asynccontextmanager
+import multiprocessing
 import tempfile
 import os
-import shutil
 import re
+import sys
+import threading
+import aiofiles
+import aiofiles.os
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# ============================================
+# LOGGING
+# ============================================
+# Windows consoles default to a legacy code page (cp1252), where writing a
+# non-ASCII filename raises UnicodeEncodeError - switch stdio to UTF-8
+# Done here in the entry point, not in a library module: it is process-global
+# (spawned parse workers re-import this module, so they get it too)
+for _stream in (sys.stdout, sys.stderr):
+    if hasattr(_stream, "reconfigure"):
+        _stream.reconfigure(encoding="utf-8", errors="replace")
+
+# Request handlers only enqueue log records (QueueHandler)
+# A background QueueListener thread formats them and does the blocking write
+# Why: print() writes + flushes stdout synchronously on the event loop thread
+# Guarded so a second import of this module doesn't attach handlers twice
+
+logger = logging.getLogger("docusearch")
+logger.setLevel(logging.INFO)
+
+if not logger.handlers:
+    _log_queue = queue.SimpleQueue()
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    )
+    logger.addHandler(QueueHandler(_log_queue))
+    logger.propagate = False
+    _log_listener = QueueListener(_log_queue, _log_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)  # Flush pending records on exit
 
 # Try to import magic (file type detection)
 # Fallback to basic validation if not available
 try:
     import magic
     MAGIC_AVAILABLE = True
+    # One shared detector: magic.from_buffer() reloads the magic DB on every call
+    # libmagic handles are not thread-safe, so calls go through _MAGIC_LOCK
+    _MAGIC_MIME = magic.Magic(mime=True)
+    _MAGIC_LOCK = threading.Lock()
 except ImportError:
     MAGIC_AVAILABLE = False
-    print("Warning: python-magic not available. Using basic file validation.")
+    logger.warning("python-magic not available. Using basic file validation.")
 
-# Don't import PaperQA at startup - it's slow!
-# Import it only when user clicks "Initialize" (lazy loading)
-PaperQA = None
 
 # ============================================
 # SECURITY CONFIGURATION
@@ -49,20 +99,41 @@ load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 if not GROQ_API_KEY:
-    print("=" * 60)
-    print("ERROR: GROQ_API_KEY not found!")
-    print("=" * 60)
-    print("Create a file: backend/.env")
-    print("Add this line: GROQ_API_KEY=gsk_your_key_here")
-    print("=" * 60)
-    import sys
+    logger.error("=" * 60)
+    logger.error("GROQ_API_KEY not found!")
+    logger.error("Create a file: backend/.env")
+    logger.error("Add this line: GROQ_API_KEY=gsk_your_key_here")
+    logger.error("=" * 60)
     sys.exit(1)
 
+# Groq key shape: "gsk_" + printable ASCII (no spaces/control chars/newlines
+# pasted in from .env editing) - one C-level regex match instead of per-char checks
+# Warn only: a malformed key fails loudly at the first LLM call anyway, and
+# Groq may change the format
+_GROQ_KEY_RE = re.compile(r"gsk_[\x21-\x7e]{16,500}")
+if not _GROQ_KEY_RE.fullmatch(GROQ_API_KEY):
+    logger.warning("GROQ_API_KEY does not look like a Groq key (expected gsk_..., no spaces)")
+
 # File upload security limits
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB per file
 MAX_TOTAL_UPLOAD = 200 * 1024 * 1024  # 200MB total per request
-ALLOWED_EXTENSIONS = {'.pdf'}
+ALLOWED_EXTENSIONS = {'.pdf'}  # Documented whitelist (checked via endswith('.pdf'))
 ALLOWED_MIME_TYPES = {'application/pdf'}
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB per write when streaming uploads to disk
+MAX_BATCH_QUESTIONS = 48  # Questions per /batch-query request
+
+# Where Chroma persists documents (kept across restarts, wiped by /reset)
+CHROMA_PERSIST_DIR = os.getenv(
+    "CHROMA_PERSIST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "chroma_db")
+)
+
+# Keep uploads up to MAX_FILE_SIZE in RAM while parsing the multipart body
+# Why: Starlette spools anything over 1MB to a temp file, so a PDF was written
+#      to disk, read back for validation, then copied to disk again
+# Note: larger files still spill to disk and get rejected by validation
+# Trade-off: a request can hold up to MAX_TOTAL_UPLOAD of uploads in memory
+MultiPartParser.spool_max_size = MAX_FILE_SIZE
 
 # Rate limiting configuration
 # Why these limits? See SECURITY_IMPROVEMENTS.md
@@ -70,19 +141,66 @@ RATE_LIMITS = {
     "init": "5/minute",      # Expensive operation (API validation)
     "upload": "10/hour",     # File processing is resource-intensive
     "query": "30/minute",    # Main feature, allow reasonable usage
+    "batch_query": "5/minute",  # Up to 48 LLM calls per request
+    "batch_questions": "60/minute",  # Questions across /batch-query calls (1 LLM call each)
     "status": "60/minute",   # Cheap operation, can be frequent
     "remove": "20/hour",     # Modify operation, moderate limit
-    "reset": "5/hour"        # Destructive operation, strict limit
+    "reset": "5/hour",       # Destructive operation, strict limit
+    "cache": "10/hour"       # Clearing the answer cache forces fresh LLM calls
 }
 
 # ============================================
 # FASTAPI APPLICATION SETUP
 # ============================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: build PaperQA, reopening documents persisted by a previous run
+    Shutdown: stop the PDF parsing process pool, flush the answer cache to disk
+    """
+    logger.info("Initializing RAG system (may take 1-2 min)...")
+    # Imported here, not at module top: spawned parse workers re-import this
+    # module and must not pull in torch + the embedding model
+    from rag_engine import PaperQA
+    # to_thread: construction loads the model (blocking)
+    app.state.rag = await asyncio.to_thread(
+        lambda: PaperQA(groq_api_key=GROQ_API_KEY, persist_directory=CHROMA_PERSIST_DIR)
+    )
+    logger.info("RAG system ready! %d file(s) loaded", len(app.state.rag.loaded_files()))
+    try:
+        yield
+    finally:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(cancel_futures=True)
+        # Stores only save every CACHE_SAVE_INTERVAL seconds
+        await asyncio.to_thread(app.state.rag.save_cache)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson
+
+    orjson encodes straight to UTF-8 bytes and is several times faster than
+    json.dumps on string-heavy payloads (answers, sources)
+    OPT_NON_STR_KEYS: int keys (e.g. page numbers) like the json module
+    OPT_SERIALIZE_NUMPY: numpy scalars/arrays from the retrieval index
+    Why not fastapi.responses.ORJSONResponse: deprecated, and fixed options
+    """
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+# ORJSONResponse as default for routes returning plain dicts
+# Routes with a response_model keep the default on purpose: recent FastAPI
+# then serializes them straight to JSON bytes in pydantic-core (Rust) - an
+# explicit response_class=... would force the slower dict + render path
 app = FastAPI(
+    lifespan=lifespan,
     title="DocuSearch API",
     version="1.0.0",
-    description="RAG-powered document Q&A system with security hardening"
+    description="RAG-powered document Q&A system with security hardening",
+    default_response_class=ORJSONResponse
 )
 
 # ============================================
@@ -94,10 +212,30 @@ app = FastAPI(
 # Alternative: Cloud rate limiting (expensive)
 # Chosen: slowapi (best FastAPI integration)
 
+#
+# Limits are enforced by the per-route @limiter.limit decorators only
+# Why no SlowAPIMiddleware/SlowAPIASGIMiddleware: they exist to apply
+# default_limits globally; we have none, so adding either would put an extra
+# layer in front of every request without enforcing anything new
+# app.state.limiter + the exception handler are what the decorators need
+
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# ============================================
+# RESPONSE COMPRESSION
+# ============================================
+# /query answers + source previews are often 20-50KB of JSON
+# GZip cuts that ~70% on the wire (slow mobile networks, egress)
+# minimum_size=1024: small responses (/status, /upload result) are left as-is
+# compresslevel=5: most of the size win for a fraction of level 9's CPU
+#
+# Added before SecurityHeadersMiddleware on purpose: Starlette wraps the app
+# in reverse add order, so gzip sits inside the security headers layer
+
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # ============================================
 # SECURITY HEADERS MIDDLEWARE
 # ============================================
@@ -107,7 +245,51 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # Alternative: Starlette built-in (limited)
 # Chosen: Custom middleware (full control, no dependencies)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+# Header tuples are built once at import and appended to every response
+# Why raw bytes: ASGI headers are (bytes, bytes) pairs, no per-request encoding
+_SECURITY_HEADERS = [
+    # Prevent XSS attacks (older browsers)
+    # Modern browsers use CSP, but this helps legacy
+    (b"x-xss-protection", b"1; mode=block"),
+
+    # Prevent clickjacking (iframe embedding)
+    # DENY = never allow iframing
+    # Alternative: SAMEORIGIN (allow same-domain iframes)
+    (b"x-frame-options", b"DENY"),
+
+    # Prevent MIME type sniffing
+    # Forces browser to respect Content-Type header
+    # Prevents: executing images as JavaScript
+    (b"x-content-type-options", b"nosniff"),
+
+    # Content Security Policy (CSP)
+    # Most powerful XSS prevention
+    # Restricts what resources can load
+    (b"content-security-policy", (
+        b"default-src 'self'; "  # Only load from same origin
+        b"script-src 'self'; "   # Only our JavaScript
+        b"style-src 'self' 'unsafe-inline'; "  # Our CSS + inline (Tailwind needs this)
+        b"img-src 'self' data: https:; "  # Images: ours + data URLs + HTTPS
+        b"font-src 'self'; "     # Only our fonts
+        b"connect-src 'self'; "  # Only our API
+        b"frame-ancestors 'none';"  # Can't be iframed (same as X-Frame-Options)
+    )),
+
+    # Control referrer information leakage
+    # strict-origin-when-cross-origin: Send origin only to different sites
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+
+    # Disable dangerous browser features
+    # Prevents: location tracking, microphone/camera access
+    (b"permissions-policy", (
+        b"geolocation=(), "
+        b"microphone=(), "
+        b"camera=()"
+    )),
+]
+
+
+class SecurityHeadersMiddleware:
     """
     Add security headers to all responses
 
@@ -119,52 +301,31 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     5. Referrer-Policy: Controls referrer information
     6. Permissions-Policy: Restricts browser features
 
+    Sent on every route, /status and / included - a response without them
+    could be framed or MIME-sniffed like any other
+    Per-request cost is one list concatenation (headers are prebuilt bytes)
+
+    Implemented as pure ASGI middleware (not BaseHTTPMiddleware)
+    Why: BaseHTTPMiddleware wraps every request in extra Request/Response
+         objects and spawns a task per call - measurable overhead on all endpoints
+    How: Wrap `send` and append headers to the http.response.start message
+
     See SECURITY_IMPROVEMENTS.md for detailed explanation
     """
 
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Prevent XSS attacks (older browsers)
-        # Modern browsers use CSP, but this helps legacy
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-
-        # Prevent clickjacking (iframe embedding)
-        # DENY = never allow iframing
-        # Alternative: SAMEORIGIN (allow same-domain iframes)
-        response.headers['X-Frame-Options'] = 'DENY'
-
-        # Prevent MIME type sniffing
-        # Forces browser to respect Content-Type header
-        # Prevents: executing images as JavaScript
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-
-        # Content Security Policy (CSP)
-        # Most powerful XSS prevention
-        # Restricts what resources can load
-        response.headers['Content-Security-Policy'] = (
-            "default-src 'self'; "  # Only load from same origin
-            "script-src 'self'; "   # Only our JavaScript
-            "style-src 'self' 'unsafe-inline'; "  # Our CSS + inline (Tailwind needs this)
-            "img-src 'self' data: https:; "  # Images: ours + data URLs + HTTPS
-            "font-src 'self'; "     # Only our fonts
-            "connect-src 'self'; "  # Only our API
-            "frame-ancestors 'none';"  # Can't be iframed (same as X-Frame-Options)
-        )
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        # Control referrer information leakage
-        # strict-origin-when-cross-origin: Send origin only to different sites
-        response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-        # Disable dangerous browser features
-        # Prevents: location tracking, microphone/camera access
-        response.headers['Permissions-Policy'] = (
-            'geolocation=(), '
-            'microphone=(), '
-            'camera=()'
-        )
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + _SECURITY_HEADERS
+            await send(message)
 
-        return response
+        await self.app(scope, receive, send_wrapper)
 
 app.add_middleware(SecurityHeadersMiddleware)
 
@@ -178,20 +339,44 @@ app.add_middleware(SecurityHeadersMiddleware)
 # 1. Specific methods only (GET, POST) - not PUT, DELETE, TRACE, etc.
 # 2. Specific headers only - not custom dangerous headers
 # 3. max_age for caching preflight (performance + security)
+# 4. Regex origin for this project's Vercel previews (the old wildcard never matched)
 #
 # Alternative: nginx CORS (needs infrastructure)
-# Alternative: Regex origins (complex, error-prone)
-# Chosen: Explicit whitelist (simple, secure)
+# Alternative: Regex origins for everything (complex, error-prone)
+# Alternative: Any *.vercel.app -> every Vercel user's site could make
+#              credentialed requests against us
+# Chosen: Explicit whitelist + one anchored regex limited to our project prefix
+#
+# Note: allow_origins entries are literal matches - "https://*.vercel.app"
+# never matched anything, so preview deployments need allow_origin_regex
+
+# Preflight cache lifetime in seconds (default: 24h)
+# Browsers clamp this to their own maximum (Chrome: 2h, Firefox: 24h)
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "86400"))
+
+# Exact origins, comma-separated in CORS_ORIGINS (overrides the defaults below)
+_DEFAULT_CORS_ORIGINS = (
+    "http://localhost:3000,"   # Vite dev server
+    "http://localhost:5173,"   # Alternative Vite port
+    "https://docu-search-qy9zbuu81-swastik-sahoos-projects.vercel.app,"  # Vercel preview
+    "https://docu-search.vercel.app"  # Vercel production (if you set custom domain)
+)
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", _DEFAULT_CORS_ORIGINS).split(",")
+    if origin.strip()
+]
+
+# Vercel previews are named <project>-<hash>-<team>.vercel.app
+# Only our project + team's deployments match; set CORS_ORIGIN_REGEX= (empty) to disable
+CORS_ORIGIN_REGEX = os.getenv(
+    "CORS_ORIGIN_REGEX", r"https://docu-?search(-[a-z0-9]+-swastik-sahoos-projects)?\.vercel\.app"
+) or None
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",   # Vite dev server
-        "http://localhost:5173",   # Alternative Vite port
-        "https://docu-search-qy9zbuu81-swastik-sahoos-projects.vercel.app",  # Vercel preview
-        "https://docu-search.vercel.app",  # Vercel production (if you set custom domain)
-        "https://*.vercel.app"     # Any Vercel preview deployment
-    ],
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=CORS_ORIGIN_REGEX,  # Starlette fullmatches this
     allow_credentials=True,  # Allow cookies/auth headers
     allow_methods=["GET", "POST"],  # Only what we use (was: ["*"])
     allow_headers=[  # Specific headers only (was: ["*"])
@@ -201,25 +386,22 @@ app.add_middleware(
         "Accept-Language",
         "Content-Language"
     ],
-    max_age=600,  # Cache preflight for 10 minutes (performance)
+    max_age=CORS_MAX_AGE,  # Cache preflight (saves an OPTIONS round-trip per request)
 )
 
-# Global state
-rag_instance: Optional[PaperQA] = None
-loaded_files: List[str] = []
-
-def get_rag_instance():
-    """Lazy load RAG instance on first use (auto-initialized with API key from .env)"""
-    global rag_instance
-    if rag_instance is None:
-        print("Initializing RAG system (first use - may take 1-2 min)...")
-        from rag_engine import PaperQA as PaperQAClass
-        rag_instance = PaperQAClass(
-            groq_api_key=GROQ_API_KEY,
-            persist_directory=tempfile.mkdtemp()
-        )
-        print("RAG system ready!")
-    return rag_instance
+# ============================================
+# RAG INSTANCE (dependency)
+# ============================================
+# One PaperQA per process, built in lifespan() and injected with Depends(get_rag)
+# Why at startup: the first /upload or /query no longer waits 1-2 min for the
+#     embedding model, and no per-request global/lock juggling is needed
+# Why a stable directory: documents survive restarts (was: a fresh
+#     tempfile.mkdtemp() per initialization, never cleaned up)
+
+
+def get_rag(request: Request):
+    """FastAPI dependency: the process-wide PaperQA instance"""
+    return request.app.state.rag
 
 # ============================================
 # PYDANTIC MODELS WITH VALIDATION
@@ -232,6 +414,40 @@ def get_rag_instance():
 
 # InitRequest removed - API key now comes from .env file
 
+# Basic XSS patterns rejected in questions (defense-in-depth, CSP is primary)
+# One compiled case-insensitive alternation = single scan, no lowercased copy
+_DANGEROUS_RE = re.compile(
+    r"<script|javascript:|onerror=|onclick=|onload=|<iframe",
+    re.IGNORECASE
+)
+
+# Translation tables that delete control characters in one C-level pass
+# _CONTROL_TABLE: ASCII controls (0x00-0x1F, 0x7F) - filename validation
+# _SANITIZE_TABLE: also C1 controls (0x80-0x9F) and filesystem-unsafe
+#                  characters (<>:"|?*) - filename sanitization in one pass
+_CONTROL_TABLE = str.maketrans('', '', ''.join(map(chr, range(0x20))) + '\x7f')
+_SANITIZE_TABLE = str.maketrans(
+    '', '',
+    ''.join(map(chr, range(0x20))) + ''.join(map(chr, range(0x7f, 0xa0))) + '<>:"|?*'
+)
+
+
+def clean_question(v: str) -> str:
+    """Normalize + validate one question (shared by QueryRequest/BatchQueryRequest)"""
+    # Normalize whitespace (multiple spaces -> single space)
+    v = ' '.join(v.split())
+
+    # Check minimum meaningful length
+    if len(v.strip()) < 3:
+        raise ValueError('Question too short. Minimum 3 characters.')
+
+    # Basic XSS prevention (not comprehensive, CSP is primary defense)
+    # This is defense-in-depth
+    if _DANGEROUS_RE.search(v):
+        raise ValueError('Invalid characters in question')
+
+    return v
+
 
 class QueryRequest(BaseModel):
     """
@@ -255,6 +471,12 @@ class QueryRequest(BaseModel):
         le=10,  # Less than or equal to 10 (prevent resource exhaustion)
         description="Number of sources to retrieve (1-10)"
     )
+    cache_threshold: Optional[float] = Field(
+        default=None,
+        ge=0.5,  # Below this unrelated questions would share answers
+        le=1.0,  # 1.0 = only reuse answers for (near-)identical questions
+        description="Semantic cache similarity threshold (default: server setting)"
+    )
 
     @validator('question')
     def validate_question(cls, v):
@@ -268,25 +490,42 @@ class QueryRequest(BaseModel):
 
         Why: Prevent injection attacks and malformed queries
         """
-        # Normalize whitespace (multiple spaces -> single space)
-        v = ' '.join(v.split())
-
-        # Check minimum meaningful length
-        if len(v.strip()) < 3:
-            raise ValueError('Question too short. Minimum 3 characters.')
-
-        # Basic XSS prevention (not comprehensive, CSP is primary defense)
-        # This is defense-in-depth
-        dangerous_patterns = [
-            '<script', 'javascript:', 'onerror=',
-            'onclick=', 'onload=', '<iframe'
-        ]
-        v_lower = v.lower()
-        for pattern in dangerous_patterns:
-            if pattern in v_lower:
-                raise ValueError('Invalid characters in question')
+        return clean_question(v)
 
-        return v
+
+class BatchQueryRequest(BaseModel):
+    """
+    Batch query request - several questions answered in one pass
+
+    Security validations:
+    - Batch size limit (each question costs one LLM call)
+    - Same per-question checks as QueryRequest
+    """
+    questions: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_QUESTIONS,  # Bound LLM calls per request
+        description=f"Questions to ask about documents (1-{MAX_BATCH_QUESTIONS})"
+    )
+    num_sources: int = Field(
+        default=4,
+        ge=1,
+        le=10,
+        description="Number of sources to retrieve per question (1-10)"
+    )
+    cache_threshold: Optional[float] = Field(
+        default=None,
+        ge=0.5,
+        le=1.0,
+        description="Semantic cache similarity threshold (default: server setting)"
+    )
+
+    @validator('questions', each_item=True)
+    def validate_questions(cls, v):
+        """Same checks as QueryRequest.question, applied to every question"""
+        if len(v) > 1000:
+            raise ValueError('Question too long. Maximum 1000 characters.')
+        return clean_question(v)
 
 
 class RemoveFileRequest(BaseModel):
@@ -331,7 +570,7 @@ class RemoveFileRequest(BaseModel):
             raise ValueError('Filename must end with .pdf')
 
         # Check for control characters
-        if any(ord(c) < 32 or ord(c) == 127 for c in v):
+        if len(v.translate(_CONTROL_TABLE)) != len(v):
             raise ValueError('Invalid filename: control characters detected')
 
         return v
@@ -342,11 +581,21 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
     num_sources: int
+    model: Optional[str] = None  # LLM that produced the answer (fast/big routing)
+    error: Optional[str] = None  # /batch-query only: set when this question failed
+
+
+class BatchQueryResponse(BaseModel):
+    """Batch query response - one QueryResponse per question, in order"""
+    results: List[QueryResponse]
 
 
 class StatusResponse(BaseModel):
     """Status response model (no validation needed - we control this)"""
-    initialized: bool
+    # Deprecated: always true - PaperQA is built at startup (lifespan), and the
+    # server doesn't accept requests before that. Kept so existing clients that
+    # read it don't break; will be removed in a future version
+    initialized: bool = Field(default=True, deprecated="Always true; will be removed")
     files_loaded: List[str]
     total_chunks: int
 
@@ -355,6 +604,22 @@ class StatusResponse(BaseModel):
 # FILE UPLOAD SECURITY FUNCTIONS
 # ============================================
 
+def upload_size(file: UploadFile) -> int:
+    """
+    Size of an uploaded file in bytes
+
+    Starlette's multipart parser records UploadFile.size while streaming the
+    body to the spooled temp file, so no seek/tell is needed
+    Fallback: seek to the end for UploadFile objects built without a size
+    """
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, 2)  # Seek to end of file
+    file_size = file.file.tell()  # Get current position = file size
+    file.file.seek(0)  # Reset to beginning for reading
+    return file_size
+
+
 async def validate_upload_file(file: UploadFile) -> None:
     """
     Comprehensive file upload validation
@@ -405,8 +670,10 @@ async def validate_upload_file(file: UploadFile) -> None:
     # 2. Validate file extension
     # Why whitelist over blacklist: Can't anticipate all dangerous extensions
     # Alternative: Blacklist .exe, .sh, .bat -> Easy to bypass with .com, .scr, etc.
-    file_ext = os.path.splitext(filename)[1].lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
+    # ALLOWED_EXTENSIONS is just {'.pdf'}: one C-level endswith() instead of
+    # splitext() + set lookup (splitext only runs to build the error message)
+    if not filename.lower().endswith('.pdf'):
+        file_ext = os.path.splitext(filename)[1].lower()
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Only PDF files allowed. Got: {file_ext}"
@@ -416,9 +683,7 @@ async def validate_upload_file(file: UploadFile) -> None:
     # Why 10MB: Typical academic paper is 1-5MB, 10MB covers edge cases
     # Alternative: 50MB, 100MB -> Increases DOS risk
     # Alternative: Unlimited -> Severe DOS risk
-    file.file.seek(0, 2)  # Seek to end of file
-    file_size = file.file.tell()  # Get current position = file size
-    file.file.seek(0)  # Reset to beginning for reading
+    file_size = upload_size(file)
 
     if file_size > MAX_FILE_SIZE:
         size_mb = file_size / (1024 * 1024)
@@ -440,29 +705,32 @@ async def validate_upload_file(file: UploadFile) -> None:
     file_content = await file.read(2048)  # Read first 2KB
     file.file.seek(0)  # Reset for later processing
 
+    # Cheap check first: PDF files start with "%PDF-" (bytes: 0x25 0x50 0x44 0x46 0x2D)
+    # Rejects non-PDFs in one prefix compare, before any libmagic call
+    if not file_content.startswith(b'%PDF-'):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file content. File does not appear to be a PDF"
+        )
+
     if MAGIC_AVAILABLE:
+        # Second opinion from libmagic on files that passed the prefix check
+        # Why keep it: prefix alone is easy to forge (defense in depth)
         try:
             # python-magic library checks file signature
-            mime = magic.from_buffer(file_content, mime=True)
-
-            if mime not in ALLOWED_MIME_TYPES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid file content. Expected PDF, got: {mime}"
-                )
+            with _MAGIC_LOCK:
+                mime = _MAGIC_MIME.from_buffer(file_content)
         except Exception as e:
             # If magic fails, reject (fail secure)
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to validate file type for {filename}"
             )
-    else:
-        # Fallback: Check PDF magic number manually
-        # PDF files start with "%PDF-" (bytes: 0x25 0x50 0x44 0x46 0x2D)
-        if not file_content.startswith(b'%PDF-'):
+
+        if mime not in ALLOWED_MIME_TYPES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file content. File does not appear to be a PDF"
+                detail=f"Invalid file content. Expected PDF, got: {mime}"
             )
 
 
@@ -483,11 +751,9 @@ def sanitize_filename(filename: str) -> str:
     # Remove any path components
     filename = os.path.basename(filename)
 
-    # Remove control characters
-    filename = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', filename)
-
-    # Remove dangerous characters for filesystems
-    filename = re.sub(r'[<>:"|?*]', '', filename)
+    # Remove control characters and dangerous characters for filesystems
+    # Single translate() pass over the precompiled table
+    filename = filename.translate(_SANITIZE_TABLE)
 
     # Limit length (keep extension)
     name, ext = os.path.splitext(filename)
@@ -497,6 +763,96 @@ def sanitize_filename(filename: str) -> str:
     return f"{name}{ext}"
 
 
+# ============================================
+# PARALLEL PDF INGESTION
+# ============================================
+# PDF parsing + chunking is CPU-bound pure Python (pypdf, text splitter)
+# Threads would serialize on the GIL, so files are parsed in a process pool
+# Alternative: asyncio.to_thread (simple, but one core for all files)
+# Chosen: ProcessPoolExecutor, created on first upload
+#
+# spawn context: workers start clean instead of forking a process that
+# already runs threads (logging listener, thread pool) and holds torch state
+# Workers only import pdf_loader.py, not the embedding model
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Lazily create the PDF parsing process pool"""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+
+def reset_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a broken pool so the next upload builds a fresh one
+
+    A worker that dies (PDFium crash on a crafted file, OOM killer) marks the
+    whole executor broken - without this every later upload would fail with
+    BrokenProcessPool until the server restarts
+    Only replaces `pool` if it is still the current one (a concurrent upload
+    may already have reset it)
+    """
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def process_upload(file: UploadFile, safe_filename: str) -> list:
+    """
+    Write one validated upload to disk and parse it into chunks
+
+    Runs concurrently for all files of a request (asyncio.gather in /upload)
+
+    Returns:
+        List of chunk Documents tagged with safe_filename
+    """
+    temp_path = None
+    try:
+        # Unique temporary file per upload
+        # Why temp directory: Isolated, auto-cleaned, proper permissions
+        # Why not tempdir/safe_filename: predictable path, and two concurrent
+        #     uploads of the same name would overwrite each other
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=tempfile.gettempdir()) as tmp:
+            temp_path = tmp.name
+
+        # Write uploaded file to disk in 1MB chunks
+        # Why async: a blocking copy of a 25MB file stalls every other request
+        # Why not os.sendfile/io_uring: accepted uploads are held in memory
+        #     (MultiPartParser.spool_max_size), so there is no source fd to
+        #     zero-copy from - this loop is the only copy
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
+
+        # Parse + chunk in the process pool
+        # safe_filename is passed so chunks are tagged with the original name
+        loop = asyncio.get_running_loop()
+        pool = get_parse_pool()
+        try:
+            chunks = await loop.run_in_executor(pool, load_pdf_chunks, temp_path, safe_filename)
+        except BrokenProcessPool:
+            # This file fails (reported by /upload), later uploads get a new pool
+            logger.error("PDF parse worker died while processing %s - restarting the pool", safe_filename)
+            reset_parse_pool(pool)
+            raise
+        logger.info("Loaded %s: %d chunks", safe_filename, len(chunks))
+        return chunks
+    finally:
+        # Clean up temporary file (also when processing failed)
+        # Why: Prevent disk exhaustion from temp files
+        if temp_path:
+            await aiofiles.os.remove(temp_path)
+
+
 @app.get("/")
 @limiter.limit(RATE_LIMITS["status"])
 async def root(request: Request):
@@ -513,7 +869,7 @@ async def root(request: Request):
 
 @app.post("/upload")
 @limiter.limit(RATE_LIMITS["upload"])
-async def upload_files(request: Request, files: List[UploadFile] = File(...)):
+async def upload_files(request: Request, files: List[UploadFile] = File(...), rag_instance=Depends(get_rag)):
     """
     Upload and process PDF files with comprehensive security validation
 
@@ -541,21 +897,15 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
         429: Rate limit exceeded
         500: Server error
     """
-    global loaded_files
-
-    # Auto-initialize RAG instance on first use
-    rag_instance = get_rag_instance()
-
     # Check total upload size
     # Why: Prevent memory exhaustion from massive uploads
     # Alternative: No limit -> Risk of server crash
     # Alternative: Per-file only -> Can upload 100x 10MB files
     # Chosen: Both per-file AND total limits
-    total_size = sum(
-        file.file.seek(0, 2) or file.file.tell()
-        for file in files
-        if (file.file.seek(0) or True)  # Reset after seek
-    )
+    # Sizes come from UploadFile.size (recorded while parsing the body, see upload_size())
+    total_size = 0
+    for file in files:
+        total_size += upload_size(file)
 
     if total_size > MAX_TOTAL_UPLOAD:
         size_mb = total_size / (1024 * 1024)
@@ -568,51 +918,61 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
     processed_files = []
     errors = []
 
-    for file in files:
-        try:
-            # SECURITY: Comprehensive file validation
-            # Validates: filename, extension, size, MIME type, empty files
-            # See validate_upload_file() function for detailed checks
-            await validate_upload_file(file)
-
-            # SECURITY: Sanitize filename before using
-            # Prevents: path traversal, control characters, filesystem issues
-            safe_filename = sanitize_filename(file.filename)
-
-            # Use safe filename for temporary storage
-            # Why temp directory: Isolated, auto-cleaned, proper permissions
-            temp_path = os.path.join(tempfile.gettempdir(), safe_filename)
-
-            # Write uploaded file to disk
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # Process PDF through RAG engine
-            chunks = rag_instance.load_pdf(temp_path)
-            all_chunks.extend(chunks)
-            processed_files.append(safe_filename)
-            loaded_files.append(safe_filename)
-
-            # Clean up temporary file
-            # Why: Prevent disk exhaustion from temp files
-            os.remove(temp_path)
-
-        except HTTPException:
-            # Re-raise validation errors (already have proper status codes)
-            raise
-        except Exception as e:
+    # Phase 1 - SECURITY: Comprehensive file validation (all files concurrently)
+    # Validates: filename, extension, size, MIME type, empty files
+    # See validate_upload_file() function for detailed checks
+    # Why up front: header reads overlap, and nothing is indexed if any file is invalid
+    validation_results = await asyncio.gather(
+        *[validate_upload_file(file) for file in files],
+        return_exceptions=True
+    )
+    for result in validation_results:
+        if isinstance(result, HTTPException):
+            # Validation errors already have proper status codes
+            raise result
+
+    # Phase 2 - Write + parse all valid files in parallel (see process_upload)
+    pending = []
+    for file, result in zip(files, validation_results):
+        if isinstance(result, Exception):
+            # Unexpected validation failure - treat like a processing error
+            logger.error("Error processing %s: %s", file.filename, result, exc_info=result)
+            errors.append(f"{file.filename}: Failed to process")
+            continue
+
+        # SECURITY: Sanitize filename before using
+        # Prevents: path traversal, control characters, filesystem issues
+        pending.append((file, sanitize_filename(file.filename)))
+
+    parse_results = await asyncio.gather(
+        *[process_upload(file, safe_filename) for file, safe_filename in pending],
+        return_exceptions=True
+    )
+
+    for (file, safe_filename), result in zip(pending, parse_results):
+        if isinstance(result, ScannedPDFError):
+            # Expected, user-fixable condition - tell the user why it was skipped
+            logger.warning("Skipping scanned PDF %s: %s", file.filename, result)
+            errors.append(f"{file.filename}: No extractable text (scanned PDF?) - skipped")
+            continue
+        if isinstance(result, Exception):
             # Log actual error internally (for debugging)
-            print(f"Error processing {file.filename}: {str(e)}")
+            logger.error("Error processing %s", file.filename, exc_info=result)
             # Return generic error to user (security - don't leak internals)
             errors.append(f"{file.filename}: Failed to process")
+            continue
+
+        all_chunks.extend(result)
+        processed_files.append(safe_filename)
 
     # Create or update vector store with all chunks
+    # Single call for the whole request = one embedding pass over all chunks
     if all_chunks:
         try:
-            rag_instance.create_vectorstore(all_chunks)
-        except Exception as e:
+            await asyncio.to_thread(rag_instance.create_vectorstore, all_chunks)
+        except Exception:
             # Log internally
-            print(f"Vector store creation failed: {str(e)}")
+            logger.exception("Vector store creation failed")
             # Generic error to user
             raise HTTPException(
                 status_code=500,
@@ -629,7 +989,7 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
 
 @app.post("/query", response_model=QueryResponse)
 @limiter.limit(RATE_LIMITS["query"])
-async def query(request: Request, query_request: QueryRequest):
+async def query(request: Request, query_request: QueryRequest, rag_instance=Depends(get_rag)):
     """
     Query documents with RAG system
 
@@ -650,9 +1010,6 @@ async def query(request: Request, query_request: QueryRequest):
         429: Rate limit exceeded
         500: Server error
     """
-    # Auto-initialize RAG instance on first use
-    rag_instance = get_rag_instance()
-
     if not rag_instance.vectorstore:
         raise HTTPException(status_code=400, detail="Upload files first")
 
@@ -660,25 +1017,146 @@ async def query(request: Request, query_request: QueryRequest):
         # query_request already validated by Pydantic
         # - question: sanitized, length checked, XSS filtered
         # - num_sources: 1-10 range
-        result = rag_instance.query(
+        # Retrieval + LLM call run in a worker thread (keeps event loop free)
+        result = await asyncio.to_thread(
+            rag_instance.query,
             query_request.question,
-            k=query_request.num_sources
+            k=query_request.num_sources,
+            cache_threshold=query_request.cache_threshold
         )
         return QueryResponse(
             answer=result["answer"],
             sources=result["sources"],
-            num_sources=result["num_sources"]
+            num_sources=result["num_sources"],
+            model=result.get("model")
         )
-    except Exception as e:
+    except Exception:
         # Log internally for debugging
-        print(f"Query failed: {str(e)}")
+        logger.exception("Query failed")
         # Generic error to user (security - don't leak internals)
         raise HTTPException(status_code=500, detail="Query processing failed")
 
 
+@app.post("/query/stream")
+@limiter.limit(RATE_LIMITS["query"])
+async def query_stream(request: Request, query_request: QueryRequest, rag_instance=Depends(get_rag)):
+    """
+    Query documents, streaming the answer as Server-Sent Events
+
+    Rate limit: 30/minute (shared budget with /query)
+
+    Same validation as /query. Events:
+        event: sources  data: {"sources": [...], "model": "..."}
+        data: {"token": "..."}           (repeated, answer pieces in order)
+        event: done     data: {}
+        event: error    data: {"detail": "..."}   (instead of done on failure)
+
+    Not gzipped: Starlette's GZipMiddleware skips text/event-stream
+    (buffering would hold tokens back until the end)
+
+    Returns:
+        200: Event stream
+        400: System not initialized / no documents
+        422: Validation error (Pydantic)
+        429: Rate limit exceeded
+    """
+    if not rag_instance.vectorstore:
+        raise HTTPException(status_code=400, detail="Upload files first")
+
+    async def events():
+        try:
+            async for item in rag_instance.query_stream(
+                query_request.question,
+                k=query_request.num_sources,
+                cache_threshold=query_request.cache_threshold
+            ):
+                if "token" in item:
+                    yield b"data: " + orjson.dumps(item) + b"\n\n"
+                else:
+                    yield b"event: sources\ndata: " + orjson.dumps(item) + b"\n\n"
+            yield b"event: done\ndata: {}\n\n"
+        except Exception:
+            # Headers are already sent - report the failure in-band
+            logger.exception("Streaming query failed")
+            yield b"event: error\ndata: " + orjson.dumps({"detail": "Query processing failed"}) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # no-cache: never replay a stream; X-Accel-Buffering: nginx proxies flush per event
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def parsed_batch_request(request: Request, batch_request: BatchQueryRequest) -> BatchQueryRequest:
+    """
+    Body dependency for /batch-query: records the batch size for the rate limiter
+
+    Dependencies are solved before slowapi's wrapper runs, so batch_request_cost()
+    can read it from request.state (the cost callable only gets the request)
+    """
+    request.state.batch_size = len(batch_request.questions)
+    return batch_request
+
+
+def batch_request_cost(request: Request) -> int:
+    """Rate limit cost of a /batch-query call: one hit per question"""
+    return request.state.batch_size
+
+
+@app.post("/batch-query", response_model=BatchQueryResponse)
+@limiter.limit(RATE_LIMITS["batch_query"])
+@limiter.limit(RATE_LIMITS["batch_questions"], cost=batch_request_cost)
+async def batch_query(request: Request, batch_request: BatchQueryRequest = Depends(parsed_batch_request),
+                      rag_instance=Depends(get_rag)):
+    """
+    Answer up to 48 questions in one request
+
+    Rate limit: 5/minute AND 60 questions/minute
+    Why: One request can fan out to 48 LLM calls - weighting by question
+         count keeps batches from multiplying the per-LLM-call budget
+
+    A failed LLM call fails only its own question: that result has an empty
+    answer and `error` set, the other answers are still returned
+
+    Faster than N x /query: one embedding pass and one similarity matrix
+    product for all questions, LLM calls run concurrently
+
+    Returns:
+        200: Success with one answer per question (same order)
+        400: Invalid request or system not initialized
+        422: Validation error (Pydantic)
+        429: Rate limit exceeded
+        500: Server error
+    """
+    if not rag_instance.vectorstore:
+        raise HTTPException(status_code=400, detail="Upload files first")
+
+    try:
+        results = await rag_instance.abatch_query(
+            batch_request.questions,
+            k=batch_request.num_sources,
+            cache_threshold=batch_request.cache_threshold
+        )
+        return BatchQueryResponse(results=[
+            QueryResponse(
+                answer=result["answer"],
+                sources=result["sources"],
+                num_sources=result["num_sources"],
+                model=result.get("model"),
+                error=result.get("error")
+            )
+            for result in results
+        ])
+    except Exception:
+        # Log internally for debugging
+        logger.exception("Batch query failed")
+        # Generic error to user (security - don't leak internals)
+        raise HTTPException(status_code=500, detail="Batch query processing failed")
+
 @app.get("/status", response_model=StatusResponse)
 @limiter.limit(RATE_LIMITS["status"])
-async def get_status(request: Request):
+async def get_status(request: Request, rag_instance=Depends(get_rag)):
     """
     Get system status
 
@@ -690,28 +1168,25 @@ async def get_status(request: Request):
         200: Status information
         429: Rate limit exceeded
     """
-    global rag_instance, loaded_files
-
     total_chunks = 0
-    if rag_instance and rag_instance.vectorstore:
+    if rag_instance.vectorstore:
         try:
             stats = rag_instance.get_stats()
             total_chunks = stats.get("total_chunks", 0)
-        except Exception as e:
+        except Exception:
             # Log error but don't fail the status check
-            print(f"Failed to get vector store stats: {str(e)}")
+            logger.exception("Failed to get vector store stats")
             total_chunks = 0
 
     return StatusResponse(
-        initialized=rag_instance is not None,
-        files_loaded=loaded_files,
+        files_loaded=rag_instance.loaded_files(),
         total_chunks=total_chunks
     )
 
 
 @app.post("/remove-file")
 @limiter.limit(RATE_LIMITS["remove"])
-async def remove_file(request: Request, remove_request: RemoveFileRequest):
+async def remove_file(request: Request, remove_request: RemoveFileRequest, rag_instance=Depends(get_rag)):
     """
     Remove a file from the vector store
 
@@ -727,11 +1202,6 @@ async def remove_file(request: Request, remove_request: RemoveFileRequest):
         429: Rate limit exceeded
         500: Server error
     """
-    global loaded_files
-
-    # Auto-initialize RAG instance on first use
-    rag_instance = get_rag_instance()
-
     if not rag_instance.vectorstore:
         raise HTTPException(status_code=400, detail="No files uploaded yet")
 
@@ -740,11 +1210,7 @@ async def remove_file(request: Request, remove_request: RemoveFileRequest):
         # - No path traversal
         # - Must be .pdf
         # - No control characters
-        result = rag_instance.remove_file(remove_request.filename)
-
-        # Update the global loaded_files list
-        if remove_request.filename in loaded_files:
-            loaded_files.remove(remove_request.filename)
+        result = await asyncio.to_thread(rag_instance.remove_file, remove_request.filename)
 
         return {
             "status": "success",
@@ -755,16 +1221,34 @@ async def remove_file(request: Request, remove_request: RemoveFileRequest):
     except ValueError as e:
         # File not found in vector store
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
+    except Exception:
         # Log internally
-        print(f"Failed to remove file {remove_request.filename}: {str(e)}")
+        logger.exception("Failed to remove file %s", remove_request.filename)
         # Generic error to user
         raise HTTPException(status_code=500, detail="Failed to remove file")
 
 
+@app.post("/cache/clear")
+@limiter.limit(RATE_LIMITS["cache"])
+async def clear_cache(request: Request, rag_instance=Depends(get_rag)):
+    """
+    Clear the semantic answer cache
+
+    Rate limit: 10/hour
+    Why: Every cleared entry costs a fresh LLM call next time it is asked
+
+    Returns:
+        200: Cache cleared (number of dropped entries)
+        429: Rate limit exceeded
+    """
+    cleared = await asyncio.to_thread(rag_instance.clear_cache)
+    logger.info("Cleared %d cached answers", cleared)
+    return {"status": "success", "cleared": cleared}
+
+
 @app.post("/reset")
 @limiter.limit(RATE_LIMITS["reset"])
-async def reset(request: Request):
+async def reset(request: Request, rag_instance=Depends(get_rag)):
     """
     Reset the system (clear all data)
 
@@ -778,27 +1262,27 @@ async def reset(request: Request):
         200: System reset successfully
         429: Rate limit exceeded
     """
-    global rag_instance, loaded_files
-
     try:
-        # Clean up resources (will auto-re-initialize on next use)
-        rag_instance = None
-        loaded_files = []
+        # Delete all documents - the loaded embedding model is kept
+        await asyncio.to_thread(rag_instance.reset)
 
-        return {"status": "success", "message": "System reset (will re-initialize on next use)"}
-    except Exception as e:
+        return {"status": "success", "message": "System reset"}
+    except Exception:
         # Log error
-        print(f"Failed to reset system: {str(e)}")
+        logger.exception("Failed to reset system")
         # Still return success (fail open for reset)
         return {"status": "success", "message": "System reset"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    print("="*60)
-    print("Starting DocuSearch API with security hardening...")
-    print("Rate limiting: enabled")
-    print("File validation: enabled")
-    print("Security headers: enabled")
-    print("="*60)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    logger.info("=" * 60)
+    logger.info("Starting DocuSearch API with security hardening...")
+    logger.info("Rate limiting: enabled")
+    logger.info("File validation: enabled")
+    logger.info("Security headers: enabled")
+    logger.info("=" * 60)
+    # loop/http "auto" picks uvloop + httptools when installed (uvicorn[standard])
+    # Why not force "uvloop": it has no Windows build (start_backend.bat),
+    # auto falls back to the default asyncio loop + h11 there
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto", http="auto")
\ No newline at end of file
@@ -1,17 +1,254 @@
 """
 RAG Engine for DocuSearch
-Core logic: PDF loading, chunking, embedding, retrieval, generation
+Core logic: embedding, retrieval, generation (PDF loading + chunking: pdf_loader.py)
 """
 
+import asyncio
+import json
+import logging
 import os
-from typing import List, Dict, Any
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import re
+import threading
+import time
+import uuid
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import torch
+from pdf_loader import load_pdf_chunks
+
+# Per-request lines go to the app logger (queue-backed, configured in api.py)
+# Why not print: a synchronous, flushed stdout write on every query
+logger = logging.getLogger("docusearch")
+
+# Try to import ONNX Runtime + optimum (int8 quantized embeddings)
+# Fallback to the sentence-transformers (PyTorch) model if not available
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+def _select_device() -> str:
+    """Pick the fastest available device for the embedding model"""
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+# Embedding throughput tuning (override via environment)
+# EMBED_DEVICE: cuda / mps / cpu (default: auto-detect)
+# EMBED_BATCH_SIZE: texts per forward pass - larger batches amortize tokenizer
+#                   and Python overhead and keep BLAS / GPU busy
+#                   (default: 64 on CPU, 256 on GPU)
+# EMBED_NUM_THREADS: intra-op threads for CPU inference (default: all cores)
+EMBED_DEVICE = os.getenv("EMBED_DEVICE") or _select_device()
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64" if EMBED_DEVICE == "cpu" else "256"))
+# FP16 on CUDA: tensor cores, half the memory traffic, same retrieval quality
+# MPS/CPU stay FP32 (FP16 is slower or lossy there)
+EMBED_DTYPE = torch.float16 if EMBED_DEVICE == "cuda" else torch.float32
+EMBED_NUM_THREADS = int(os.getenv("EMBED_NUM_THREADS", str(os.cpu_count() or 1)))
+
+# Set once at import (per process)
+torch.set_num_threads(EMBED_NUM_THREADS)
+
+# EMBED_BACKEND: "torch" (default) or "onnx-int8" (CPU, needs optimum[onnxruntime])
+# EMBED_ONNX_DIR: where the exported + quantized model is cached
+EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_ONNX_DIR = os.getenv(
+    "EMBED_ONNX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docusearch", "onnx")
+)
+
+# Chroma HNSW index settings (applied when the collection is created)
+# Retrieval is served from the in-memory numpy index, so Chroma's HNSW graph
+# only has to be cheap to build and persist:
+# - batch_size 1000 / sync_threshold 10000 (defaults 100 / 1000): fewer,
+#   larger index updates and disk syncs during bulk ingest
+# - M 16 / construction_ef 100: pinned explicitly (Chroma's defaults) so a
+#   default change upstream can't silently make inserts slower
+# - search_ef 64: enough recall for k <= 30 candidates
+# - space cosine: matches the normalized BGE embeddings (default is l2)
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 64,
+    "hnsw:batch_size": 1000,
+    "hnsw:sync_threshold": 10000,
+}
+
+# LLM routing: short questions whose best chunk is a confident match go to the
+# fast model, everything else to the big one
+FAST_LLM_MODEL = os.getenv("FAST_LLM_MODEL", "llama-3.1-8b-instant")
+BIG_LLM_MODEL = os.getenv("BIG_LLM_MODEL", "llama-3.3-70b-versatile")
+FAST_LLM_MIN_SIM = float(os.getenv("FAST_LLM_MIN_SIM", "0.75"))
+FAST_LLM_MAX_QUESTION_CHARS = 200
+
+# Answer token budget: the full ANSWER_MAX_TOKENS by default
+# Only a fast-model answer (short question + confident match) that doesn't ask
+# for long-form output is capped at FAST_LLM_MAX_TOKENS
+# Why not cap by default: a truncated answer is worse than a slower one
+ANSWER_MAX_TOKENS = 2048
+FAST_LLM_MAX_TOKENS = int(os.getenv("FAST_LLM_MAX_TOKENS", "1024"))
+_DETAILED_QUESTION_RE = re.compile(
+    r"\b(summar\w*|explain\w*|compar\w*|describe\w*|list|overview|differences?|steps?|how)\b",
+    re.IGNORECASE
+)
+
+# Answer prompt (shared by query and abatch_query)
+# Plain str.format_map + a HumanMessage built directly
+# Why not ChatPromptTemplate: each invoke validates the inputs and builds a
+#     PromptValue + message objects through pydantic, only to produce this
+#     same single human message
+_PROMPT_TMPL = """
+You are an expert research assistant analyzing academic documents. Your task is to provide accurate, detailed answers based ONLY on the provided context.
+
+INSTRUCTIONS:
+1. Read ALL the provided sources carefully before answering
+2. Answer the question thoroughly using information from the context
+3. Cite specific sources using [Source N] format when making claims
+4. If multiple sources contain relevant information, synthesize them
+5. If the context lacks sufficient information, explicitly state: "The provided documents do not contain enough information to answer this question"
+6. Be specific and detailed - include relevant facts, numbers, and examples from the sources
+7. Do not make assumptions or add information not present in the context
+
+CONTEXT FROM DOCUMENTS:
+{context}
+
+USER QUESTION: {question}
+
+DETAILED ANSWER:"""
+
+# /batch-query: concurrent LLM calls per batch (Groq rate limits per key)
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Semantic answer cache: a question whose embedding has cosine similarity above
+# this threshold with a cached question (same num_sources) reuses its answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+# Entry limit (least recently used answers are evicted beyond it)
+# 2000 x 384-dim float32 vectors = 3MB, answers + sources a few KB each
+SEMANTIC_CACHE_MAX_ENTRIES = max(1, int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")))
+# Stores write the cache to disk at most this often (also saved on clear + shutdown)
+CACHE_SAVE_INTERVAL = float(os.getenv("CACHE_SAVE_INTERVAL", "30"))
+
+
+class QuantizedBGEEmbeddings(Embeddings):
+    """
+    BGE embeddings served by ONNX Runtime with dynamic int8 weights
+
+    Why: FP32 inference on CPU is memory-bandwidth bound for short chunks;
+         int8 weights halve bytes moved and use VNNI dot products on modern x86
+    How: export once with optimum, quantize (AVX512-VNNI dynamic config), cache
+         the result on disk, then run the session directly with numpy I/O
+    Pooling: CLS token + L2 normalize (same as the sentence-transformers BGE config)
+    """
+
+    # One (session, tokenizer) per model directory, shared by all instances
+    _sessions: Dict[str, Any] = {}
+
+    def __init__(self, model_name: str = EMBED_MODEL_NAME, cache_dir: str = EMBED_ONNX_DIR,
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self.batch_size = batch_size
+        model_dir = os.path.join(cache_dir, model_name.strip("/").replace("/", "__"), "int8")
+        if model_dir not in self._sessions:
+            self._sessions[model_dir] = self._load(model_name, model_dir)
+        self._session, self._tokenizer = self._sessions[model_dir]
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    @staticmethod
+    def _load(model_name: str, model_dir: str):
+        quantized_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(quantized_path):
+            logger.info("Exporting %s to ONNX int8 (one-time, cached in %s)...", model_name, model_dir)
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=model_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = EMBED_NUM_THREADS
+        session = ort.InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        return session, AutoTokenizer.from_pretrained(model_dir)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self._tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True, truncation=True, max_length=512, return_tensors="np"
+            )
+            feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in self._input_names}
+            hidden = self._session.run(None, feed)[0]
+            batches.append(hidden[:, 0])  # CLS pooling
+        vecs = np.concatenate(batches).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+# ============================================
+# SHARED EMBEDDING MODEL
+# ============================================
+# One embedding model per process, shared by every PaperQA instance
+# Why: /reset drops the PaperQA instance and the next request builds a new
+#      one - it must not reload ~130MB of weights (seconds) each time
+# Weights are safetensors, which sentence-transformers already memory-maps
+_EMB_SINGLETON: Optional[Embeddings] = None
+_EMB_LOCK = threading.Lock()
+
+
+def get_embeddings() -> Embeddings:
+    """Return the process-wide embedding model, loading it on first use"""
+    global _EMB_SINGLETON
+    if _EMB_SINGLETON is None:
+        with _EMB_LOCK:
+            if _EMB_SINGLETON is None:
+                _EMB_SINGLETON = _load_embeddings()
+    return _EMB_SINGLETON
+
+
+def _load_embeddings() -> Embeddings:
+    if EMBED_BACKEND == "onnx-int8" and ONNX_AVAILABLE:
+        logger.info("Loading int8 ONNX embedding model (this may take a moment)...")
+        embeddings = QuantizedBGEEmbeddings()
+    else:
+        logger.info("Loading embedding model on %s (this may take a moment)...", EMBED_DEVICE)
+        # Batches are length-sorted inside sentence-transformers' encode(),
+        # so padding waste is already minimal - only the batch size is tuned here
+        embeddings = HuggingFaceEmbeddings(
+            model_name=EMBED_MODEL_NAME,
+            model_kwargs={
+                'device': EMBED_DEVICE,
+                'trust_remote_code': False,
+                'model_kwargs': {'torch_dtype': EMBED_DTYPE}
+            },
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': EMBED_BATCH_SIZE}
+        )
+    logger.info("Embedding model loaded!")
+    return embeddings
 
 
 class PaperQA:
@@ -21,170 +258,699 @@ class PaperQA:
         
         # High quality embeddings - BAAI/bge-small-en-v1.5
         # Better accuracy for document retrieval
-        print("Loading embedding model (this may take a moment)...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-small-en-v1.5",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        print("Embedding model loaded!")
+        if EMBED_BACKEND == "onnx-int8" and not ONNX_AVAILABLE:
+            logger.warning("optimum[onnxruntime] not available. Using PyTorch embeddings.")
+
+        self.embeddings = get_embeddings()
         
-        # Groq LLM (FREE!) - using best model with more tokens
-        self.llm = ChatGroq(
+        # Groq LLMs (FREE!) - routed per question in query()
+        # Why two: decode time scales with model size, and short questions with
+        # a confident retrieval hit get the same answer from the 8B model
+        # Chosen: 8B for easy questions, 70B for everything else
+        self.llm_fast = ChatGroq(
             api_key=groq_api_key,
-            model="llama-3.3-70b-versatile",
+            model=FAST_LLM_MODEL,
             temperature=0.1,
-            max_tokens=2048  # Increased for more detailed answers
+            max_tokens=ANSWER_MAX_TOKENS
         )
-        
-        # Text splitter - larger chunks for better context
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,
-            chunk_overlap=300,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
+        self.llm_big = ChatGroq(
+            api_key=groq_api_key,
+            model=BIG_LLM_MODEL,
+            temperature=0.1,
+            max_tokens=ANSWER_MAX_TOKENS  # Increased for more detailed answers
         )
         
+        # Bound once - str.format_map, see _PROMPT_TMPL
+        self._prompt_fn = _PROMPT_TMPL.format_map
+
         self.vectorstore = None
-        self.loaded_papers: List[str] = []
-    
-    def load_pdf(self, pdf_path: str) -> List[Document]:
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF not found: {pdf_path}")
+        self.loaded_papers: Set[str] = set()
 
-        try:
-            loader = PyPDFLoader(pdf_path)
-            pages = loader.load()
-
-            filename = os.path.basename(pdf_path)
-
-            # Clean text to remove problematic Unicode characters
-            for page in pages:
-                # Replace common Unicode characters that cause issues
-                page.page_content = page.page_content.encode('ascii', 'ignore').decode('ascii')
-                page.metadata["source"] = filename
-                page.metadata["paper"] = filename.replace(".pdf", "")
-
-            chunks = self.text_splitter.split_documents(pages)
-            # Encode filename for safe printing on Windows console
-            safe_filename = filename.encode('ascii', 'ignore').decode('ascii')
-            print(f"Loaded {safe_filename}: {len(pages)} pages -> {len(chunks)} chunks")
-            return chunks
-        except Exception as e:
-            # If PDF loading fails, raise a more informative error
-            filename = os.path.basename(pdf_path)
-            safe_filename = filename.encode('ascii', 'ignore').decode('ascii')
-            raise ValueError(f"{safe_filename}: {str(e)}")
+        # In-memory retrieval index (structure of arrays, row i = chunk i)
+        # Why: k-NN + MMR as BLAS matrix ops instead of a Chroma/SQLite
+        #      round-trip plus pairwise similarity in Python on every query
+        # _emb_matrix is a growable buffer: rows [0, _n) are used, capacity
+        #      doubles when full, so each upload only copies its new rows
+        # _alive: removed files mark their rows dead instead of compacting
+        #      (compacted once dead rows outnumber live ones)
+        # _index_lock: queries run in worker threads while uploads append to it
+        self._emb_matrix = np.empty((0, 0), dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._n = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metas: List[Dict[str, Any]] = []
+        self._rows_by_source: Dict[str, List[int]] = {}
+        self._index_lock = threading.Lock()
+        # Serializes writers (upload, remove, reset) across the Chroma
+        # collection + index + cache, so they always change together
+        # Reads only take _index_lock / _qcache_lock
+        self._mutation_lock = threading.Lock()
+
+        # Semantic answer cache (row i of _qcache_vecs = _qcache_entries[i])
+        # Why: paraphrased repeat questions skip retrieval + the 70B LLM call
+        # Bounded LRU in a growable buffer (same layout as the index above):
+        # _qcache_k: num_sources per row, 0 = free slot
+        # _qcache_used: last-used tick per row, -1 = free slot
+        # Persisted next to the vector store, so it survives restarts with it
+        # (debounced - see save_cache)
+        self._qcache_vecs = np.empty((0, 0), dtype=np.float32)
+        self._qcache_k = np.zeros(0, dtype=np.int64)
+        self._qcache_used = np.full(0, -1, dtype=np.int64)
+        self._qcache_entries: List[Optional[Dict[str, Any]]] = []
+        self._qcache_n = 0
+        self._qcache_tick = 0
+        self._qcache_hits = 0
+        self._qcache_misses = 0
+        self._qcache_dirty = False
+        self._qcache_saved_at = time.monotonic()
+        self._qcache_lock = threading.Lock()
+        self._qcache_save_lock = threading.Lock()
+        self._load_query_cache()
+
+        # Reopen a store persisted by a previous run (stable persist_directory)
+        if os.path.exists(os.path.join(self.persist_directory, "chroma.sqlite3")):
+            self._open_vectorstore()
+            if self.vectorstore._collection.count():
+                logger.info("Loading existing vector store from %s...", self.persist_directory)
+                self._rebuild_index()
+                self.loaded_papers.update(meta.get("paper", "Unknown") for meta in self._metas)
+            else:
+                self.vectorstore = None
+        # Against the index just rebuilt (an empty one drops every entry)
+        self._prune_cache()
+    
+    def load_pdf(self, pdf_path: str, filename: Optional[str] = None) -> List[Document]:
+        """Load and chunk a PDF; filename overrides the source name (default: basename)"""
+        return load_pdf_chunks(pdf_path, filename)
     
     def create_vectorstore(self, documents: List[Document]) -> None:
         if not documents:
             raise ValueError("No documents to index!")
 
-        if self.vectorstore is None:
-            # First upload - create new vectorstore
-            print(f"Creating vector store with {len(documents)} chunks...")
-            self.vectorstore = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=self.persist_directory
+        # Embed before taking _mutation_lock: the slow part, and it touches no
+        # shared state, so concurrent uploads still embed in parallel
+        embeddings = self.embeddings.embed_documents([doc.page_content for doc in documents])
+
+        with self._mutation_lock:
+            if self.vectorstore is None:
+                # First upload - create new vectorstore
+                logger.debug("Creating vector store with %d chunks...", len(documents))
+                self._open_vectorstore()
+            else:
+                # Subsequent uploads - add to existing vectorstore
+                logger.debug("Adding %d chunks to existing vector store...", len(documents))
+
+            ids = self._add_to_collection(documents, embeddings)
+            self.loaded_papers.update(doc.metadata.get("paper", "Unknown") for doc in documents)
+            logger.debug("Documents added to vector store!")
+
+            # Reuse the vectors just computed - no collection.get() of the whole store
+            self._append_to_index(
+                ids,
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents],
+                np.asarray(embeddings, dtype=np.float32)
             )
-            print("Vector store created!")
-        else:
-            # Subsequent uploads - add to existing vectorstore
-            print(f"Adding {len(documents)} chunks to existing vector store...")
-            self.vectorstore.add_documents(documents)
-            print("Documents added to vector store!")
-    
-    def query(self, question: str, k: int = 4) -> Dict[str, Any]:
-        if not self.vectorstore:
-            raise ValueError("No vector store loaded!")
+            # New documents can change the best answer to any cached question
+            self.clear_cache()
 
-        # Use MMR (Maximum Marginal Relevance) for better diversity and relevance
-        retriever = self.vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={
-                "k": k,
-                "fetch_k": k * 3,  # Fetch more candidates then filter
-                "lambda_mult": 0.7  # Balance between relevance (1.0) and diversity (0.0)
-            }
+    def _open_vectorstore(self) -> None:
+        """Open (or create) the persisted Chroma collection"""
+        self.vectorstore = Chroma(
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
+            collection_metadata=HNSW_METADATA
         )
 
-        relevant_docs = retriever.invoke(question)
-        
-        context_parts = []
-        sources = []
-        
-        for i, doc in enumerate(relevant_docs):
-            context_parts.append(f"[Source {i+1}]: {doc.page_content}")
-            sources.append({
-                "paper": doc.metadata.get("paper", "Unknown"),
-                "page": doc.metadata.get("page", "Unknown"),
-                "content_preview": doc.page_content[:200] + "..."
-            })
-        
-        context = "\n\n".join(context_parts)
-        
-        prompt = ChatPromptTemplate.from_template("""
-You are an expert research assistant analyzing academic documents. Your task is to provide accurate, detailed answers based ONLY on the provided context.
+    def _add_to_collection(self, documents: List[Document],
+                           embeddings: List[List[float]]) -> List[str]:
+        """
+        collection.add() pre-embedded chunks in max-size batches
 
-INSTRUCTIONS:
-1. Read ALL the provided sources carefully before answering
-2. Answer the question thoroughly using information from the context
-3. Cite specific sources using [Source N] format when making claims
-4. If multiple sources contain relevant information, synthesize them
-5. If the context lacks sufficient information, explicitly state: "The provided documents do not contain enough information to answer this question"
-6. Be specific and detailed - include relevant facts, numbers, and examples from the sources
-7. Do not make assumptions or add information not present in the context
+        Why not vectorstore.add_documents: LangChain writes through
+        collection.upsert, which looks up every id for an existing row first
+        Fresh client-side UUIDs can never collide, so a plain add is safe
 
-CONTEXT FROM DOCUMENTS:
-{context}
+        Returns the new ids (for the in-memory index)
+        """
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        ids = [str(uuid.uuid4()) for _ in documents]
 
-USER QUESTION: {question}
+        collection = self.vectorstore._collection
+        batch = self.vectorstore._client.get_max_batch_size()
+        for i in range(0, len(ids), batch):
+            collection.add(
+                ids=ids[i:i + batch],
+                embeddings=embeddings[i:i + batch],
+                documents=texts[i:i + batch],
+                metadatas=metadatas[i:i + batch]
+            )
+        return ids
+
+    def _rebuild_index(self) -> None:
+        """Load the in-memory retrieval index from the Chroma collection (startup)"""
+        data = self.vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+        self._clear_index()
+        if len(data["ids"]):
+            self._append_to_index(
+                list(data["ids"]),
+                list(data["documents"]),
+                list(data["metadatas"]),
+                np.asarray(data["embeddings"], dtype=np.float32)
+            )
+
+    def _clear_index(self) -> None:
+        with self._index_lock:
+            self._emb_matrix = np.empty((0, 0), dtype=np.float32)
+            self._alive = np.empty(0, dtype=bool)
+            self._n = 0
+            self._ids, self._texts, self._metas = [], [], []
+            self._rows_by_source = {}
+
+    def _append_to_index(self, ids: List[str], texts: List[str],
+                         metas: List[Dict[str, Any]], vecs: np.ndarray) -> None:
+        """Append rows to the in-memory index, doubling its capacity when full"""
+        # Normalize once so dot product = cosine similarity
+        vecs = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+        with self._index_lock:
+            start, end = self._n, self._n + len(vecs)
+            if end > len(self._emb_matrix):
+                capacity = max(end, 2 * len(self._emb_matrix), 1024)
+                grown = np.empty((capacity, vecs.shape[1]), dtype=np.float32)
+                alive = np.zeros(capacity, dtype=bool)
+                if start:
+                    grown[:start] = self._emb_matrix[:start]
+                    alive[:start] = self._alive[:start]
+                self._emb_matrix, self._alive = grown, alive
+
+            self._emb_matrix[start:end] = vecs
+            self._alive[start:end] = True
+            self._n = end
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metas.extend(metas)
+            for row, meta in enumerate(metas, start):
+                self._rows_by_source.setdefault(meta.get("source"), []).append(row)
+
+    def _remove_from_index(self, source: str) -> None:
+        """Mark a file's rows dead; compact once most rows are dead"""
+        with self._index_lock:
+            rows = self._rows_by_source.pop(source, [])
+            self._alive[rows] = False
+            if self._n and int(self._alive[:self._n].sum()) * 2 < self._n:
+                keep = np.flatnonzero(self._alive[:self._n])
+                self._emb_matrix = self._emb_matrix[keep]
+                self._alive = np.ones(len(keep), dtype=bool)
+                self._n = len(keep)
+                self._ids = [self._ids[i] for i in keep]
+                self._texts = [self._texts[i] for i in keep]
+                self._metas = [self._metas[i] for i in keep]
+                self._rows_by_source = {}
+                for row, meta in enumerate(self._metas):
+                    self._rows_by_source.setdefault(meta.get("source"), []).append(row)
+
+    def _index_sims(self, qs: np.ndarray) -> np.ndarray:
+        """Cosine similarity of normalized question vector(s) to every row (dead rows = -inf)"""
+        sims = qs @ self._emb_matrix[:self._n].T
+        sims[..., ~self._alive[:self._n]] = -np.inf
+        return sims
+
+    def _mmr_search(self, query_vec: np.ndarray, k: int, fetch_k: int,
+                    lambda_mult: float) -> Tuple[List[Document], float]:
+        """
+        Maximal Marginal Relevance over the in-memory index
+
+        1. sims = M @ q (one GEMV over all chunks)
+        2. Top fetch_k candidates via argpartition (no full sort)
+        3. Greedy MMR on the candidates' own similarity matrix
+
+        Returns the selected documents and the best cosine similarity
+        """
+        q = query_vec / np.linalg.norm(query_vec)
+
+        with self._index_lock:
+            if not self._alive[:self._n].any():
+                return [], 0.0
+            return self._mmr_select(self._index_sims(q), k, fetch_k, lambda_mult)
+
+    def _mmr_search_batch(self, query_vecs: np.ndarray, k: int, fetch_k: int,
+                          lambda_mult: float) -> List[Tuple[List[Document], float]]:
+        """_mmr_search for B questions: one (B x N) GEMM, then MMR per row"""
+        qs = query_vecs / np.linalg.norm(query_vecs, axis=1, keepdims=True)
+
+        with self._index_lock:
+            if not self._alive[:self._n].any():
+                return [([], 0.0) for _ in range(len(qs))]
+            sims = self._index_sims(qs)
+            return [self._mmr_select(row, k, fetch_k, lambda_mult) for row in sims]
+
+    def _mmr_select(self, sims: np.ndarray, k: int, fetch_k: int,
+                    lambda_mult: float) -> Tuple[List[Document], float]:
+        """MMR given one question's similarity to every chunk (caller holds _index_lock)"""
+        fetch_k = min(fetch_k, int(np.isfinite(sims).sum()))
+        k = min(k, fetch_k)
+
+        top = np.argpartition(-sims, fetch_k - 1)[:fetch_k]
+        top = top[np.argsort(-sims[top])]  # Most relevant first
+        cand = self._emb_matrix[top]
+        cand_sims = sims[top]
+        pairwise = cand @ cand.T
+
+        # First pick = most relevant, then trade relevance vs redundancy
+        selected = [0]
+        redundancy = pairwise[0].copy()
+        while len(selected) < k:
+            scores = lambda_mult * cand_sims - (1 - lambda_mult) * redundancy
+            scores[selected] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            np.maximum(redundancy, pairwise[best], out=redundancy)
+
+        # Return in relevance order (same as LangChain's Chroma MMR)
+        docs = [
+            Document(id=self._ids[i], page_content=self._texts[i], metadata=self._metas[i])
+            for i in top[sorted(selected)]
+        ]
+        return docs, float(cand_sims[0])
+
+    def _cache_paths(self):
+        return (
+            os.path.join(self.persist_directory, "query_cache.npy"),
+            os.path.join(self.persist_directory, "query_cache.json"),
+        )
 
-DETAILED ANSWER:""")
+    def _load_query_cache(self) -> None:
+        vecs_path, entries_path = self._cache_paths()
+        if not (os.path.exists(vecs_path) and os.path.exists(entries_path)):
+            return
+        try:
+            with open(entries_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            vecs = np.load(vecs_path)
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable query cache in %s", self.persist_directory, exc_info=True)
+            return
+        if len(vecs) != len(entries):
+            return
+        # Keep the newest entries if the limit was lowered since the save
+        vecs, entries = vecs[-SEMANTIC_CACHE_MAX_ENTRIES:], entries[-SEMANTIC_CACHE_MAX_ENTRIES:]
+        n = len(entries)
+        if n:
+            self._grow_cache(n, vecs.shape[1])
+            self._qcache_vecs[:n] = vecs
+            self._qcache_k[:n] = [entry["k"] for entry in entries]
+            self._qcache_used[:n] = np.arange(n)
+            self._qcache_entries = entries
+            self._qcache_n = self._qcache_tick = n
+
+    def _write_query_cache(self, vecs: np.ndarray, entries: List[Dict[str, Any]]) -> None:
+        vecs_path, entries_path = self._cache_paths()
+        try:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            np.save(vecs_path, vecs)
+            with open(entries_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+        except OSError:
+            logger.warning("Failed to persist query cache to %s", self.persist_directory, exc_info=True)
+
+    def save_cache(self) -> None:
+        """
+        Write the semantic cache to disk if it changed since the last save
+
+        Called at most every CACHE_SAVE_INTERVAL seconds by stores, on
+        clear_cache() and on shutdown
+        The snapshot is taken under _qcache_lock, the file I/O happens outside
+        it so lookups never wait on the disk
+        """
+        with self._qcache_save_lock:  # One writer at a time (same files)
+            with self._qcache_lock:
+                if not self._qcache_dirty:
+                    return
+                rows = np.flatnonzero(self._qcache_k[:self._qcache_n])  # Skip freed slots
+                vecs = self._qcache_vecs[rows]  # Fancy indexing copies
+                entries = [self._qcache_entries[i] for i in rows]
+                self._qcache_dirty = False
+                self._qcache_saved_at = time.monotonic()
+            self._write_query_cache(vecs, entries)
+
+    def _grow_cache(self, end: int, dim: int) -> None:
+        """Make room for `end` rows (capacity doubles, capped at the entry limit)"""
+        if end <= len(self._qcache_vecs):
+            return
+        capacity = min(max(end, 2 * len(self._qcache_vecs), 64), SEMANTIC_CACHE_MAX_ENTRIES)
+        vecs = np.empty((capacity, dim), dtype=np.float32)
+        ks = np.zeros(capacity, dtype=np.int64)
+        used = np.full(capacity, -1, dtype=np.int64)
+        n = self._qcache_n
+        if n:
+            vecs[:n] = self._qcache_vecs[:n]
+            ks[:n] = self._qcache_k[:n]
+            used[:n] = self._qcache_used[:n]
+        self._qcache_vecs, self._qcache_k, self._qcache_used = vecs, ks, used
+
+    def _cache_lookup(self, query_vec: np.ndarray, k: int,
+                      threshold: float) -> Optional[Dict[str, Any]]:
+        """Return a cached result for a near-duplicate question, if any"""
+        with self._qcache_lock:
+            n = self._qcache_n
+            if n:
+                sims = self._qcache_vecs[:n] @ (query_vec / np.linalg.norm(query_vec))
+                # Only entries with the same num_sources can answer (freed slots have k=0)
+                # One argmax instead of sorting every similarity
+                sims[self._qcache_k[:n] != k] = -np.inf
+                i = int(np.argmax(sims))
+                if sims[i] > threshold:
+                    self._qcache_hits += 1
+                    self._qcache_tick += 1
+                    self._qcache_used[i] = self._qcache_tick
+                    total = self._qcache_hits + self._qcache_misses
+                    logger.debug("Semantic cache hit (similarity %.3f, hit rate %d/%d)",
+                                 sims[i], self._qcache_hits, total)
+                    return self._qcache_entries[i]["result"]
+            self._qcache_misses += 1
+            return None
+
+    def _cache_store(self, query_vec: np.ndarray, k: int, result: Dict[str, Any],
+                     source_ids: List[str]) -> None:
+        self._cache_store_many(query_vec[None, :], k, [result], [source_ids])
+
+    def _cache_store_many(self, query_vecs: np.ndarray, k: int, results: List[Dict[str, Any]],
+                          source_ids: List[List[str]]) -> None:
+        """
+        Insert several answers; once full, the least recently used entry is evicted
+
+        Slot choice: argmin of the last-used tick - freed slots (tick -1) are
+        reused first, then new rows are appended until SEMANTIC_CACHE_MAX_ENTRIES,
+        then the LRU entry is overwritten
+        """
+        if not results:
+            return
+        rows = (query_vecs / np.linalg.norm(query_vecs, axis=1, keepdims=True)).astype(np.float32)
+        with self._qcache_lock:
+            for row, result, ids in zip(rows, results, source_ids):
+                n = self._qcache_n
+                slot = int(np.argmin(self._qcache_used[:n])) if n else 0
+                if n < SEMANTIC_CACHE_MAX_ENTRIES and (not n or self._qcache_used[slot] >= 0):
+                    self._grow_cache(n + 1, len(row))
+                    slot = n
+                    self._qcache_n = n + 1
+                    self._qcache_entries.append(None)
+                self._qcache_tick += 1
+                self._qcache_vecs[slot] = row
+                self._qcache_k[slot] = k
+                self._qcache_used[slot] = self._qcache_tick
+                self._qcache_entries[slot] = {"k": k, "result": result, "ids": ids}
+            self._qcache_dirty = True
+            due = time.monotonic() - self._qcache_saved_at >= CACHE_SAVE_INTERVAL
+        if due:
+            self.save_cache()
+
+    def _prune_cache(self) -> None:
+        """Drop cached answers that cite chunks no longer in the index"""
+        with self._index_lock:
+            alive = {self._ids[i] for i in np.flatnonzero(self._alive[:self._n])}
+        with self._qcache_lock:
+            for i in np.flatnonzero(self._qcache_k[:self._qcache_n]):
+                if not alive.issuperset(self._qcache_entries[i]["ids"]):
+                    # Free the slot: k=0 never matches, tick -1 is reused first
+                    self._qcache_k[i] = 0
+                    self._qcache_used[i] = -1
+                    self._qcache_entries[i] = None
+                    self._qcache_dirty = True
+
+    def clear_cache(self) -> int:
+        """Empty the semantic answer cache; returns the number of dropped entries"""
+        with self._qcache_lock:
+            dropped = int(np.count_nonzero(self._qcache_k[:self._qcache_n]))
+            self._qcache_n = 0
+            self._qcache_entries = []
+            self._qcache_used[:] = -1
+            self._qcache_dirty = True
+        self.save_cache()
+        return dropped
+
+    def _route_llm(self, question: str, max_sim: float):
+        """Pick (llm, model name, max_tokens) for a question"""
+        if max_sim <= FAST_LLM_MIN_SIM or len(question) >= FAST_LLM_MAX_QUESTION_CHARS:
+            return self.llm_big, BIG_LLM_MODEL, ANSWER_MAX_TOKENS
+        if _DETAILED_QUESTION_RE.search(question):
+            return self.llm_fast, FAST_LLM_MODEL, ANSWER_MAX_TOKENS
+        return self.llm_fast.bind(max_tokens=FAST_LLM_MAX_TOKENS), FAST_LLM_MODEL, FAST_LLM_MAX_TOKENS
+
+    def _retrieve(self, question: str, k: int, cache_threshold: Optional[float]):
+        """
+        Embed the question, then cache lookup, then MMR retrieval
+
+        Returns (query_vec, cached result or None, relevant_docs, max_sim)
+        """
+        # Embed once - used for the cache lookup and for retrieval
+        query_vec = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+
+        threshold = SEMANTIC_CACHE_THRESHOLD if cache_threshold is None else cache_threshold
+        cached = self._cache_lookup(query_vec, k, threshold)
+        if cached is not None:
+            return query_vec, cached, [], 0.0
+
+        # Use MMR (Maximum Marginal Relevance) for better diversity and relevance
+        relevant_docs, max_sim = self._mmr_search(
+            query_vec,
+            k=k,
+            fetch_k=k * 3,  # Fetch more candidates then filter
+            lambda_mult=0.7  # Balance between relevance (1.0) and diversity (0.0)
+        )
+        return query_vec, None, relevant_docs, max_sim
+
+    def query(self, question: str, k: int = 4,
+              cache_threshold: Optional[float] = None) -> Dict[str, Any]:
+        if not self.vectorstore:
+            raise ValueError("No vector store loaded!")
+
+        query_vec, cached, relevant_docs, max_sim = self._retrieve(question, k, cache_threshold)
+        if cached is not None:
+            return cached
+        context, sources = self._build_context(relevant_docs)
         
-        chain = prompt | self.llm
-        response = chain.invoke({"context": context, "question": question})
+        llm, model, max_tokens = self._route_llm(question, max_sim)
+        logger.debug("Routing to %s (max_sim %.2f, max_tokens %d)", model, max_sim, max_tokens)
+
+        msg = HumanMessage(content=self._prompt_fn({"context": context, "question": question}))
+        response = llm.invoke([msg])
         
-        return {
+        result = {
             "answer": response.content,
             "sources": sources,
-            "num_sources": len(sources)
+            "num_sources": len(sources),
+            "model": model
         }
-    
-    def remove_file(self, filename: str) -> Dict[str, Any]:
-        """Remove all chunks from a specific file from the vector store"""
+        self._cache_store(query_vec, k, result, [doc.id for doc in relevant_docs])
+        return result
+
+    async def query_stream(self, question: str, k: int = 4,
+                           cache_threshold: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of query()
+
+        Yields {"sources": [...], "model": ...} once, then {"token": "..."}
+        pieces as the LLM produces them
+        Why: the first words arrive after prefill instead of after the full
+             answer (seconds for 2048 tokens on the 70B model)
+        A cached answer is sent as a single token
+        """
         if not self.vectorstore:
             raise ValueError("No vector store loaded!")
 
-        # Get the collection from Chroma
-        collection = self.vectorstore._collection
+        # Embedding + retrieval are CPU-bound - keep them off the event loop
+        query_vec, cached, relevant_docs, max_sim = await asyncio.to_thread(
+            self._retrieve, question, k, cache_threshold
+        )
+        if cached is not None:
+            yield {"sources": cached["sources"], "model": cached.get("model")}
+            yield {"token": cached["answer"]}
+            return
+
+        context, sources = self._build_context(relevant_docs)
+        llm, model, max_tokens = self._route_llm(question, max_sim)
+        logger.debug("Streaming from %s (max_sim %.2f, max_tokens %d)", model, max_sim, max_tokens)
+        yield {"sources": sources, "model": model}
 
-        # Find all document IDs that match this filename
-        # Query by metadata to find documents from this file
-        results = collection.get(
-            where={"source": filename}
+        msg = HumanMessage(content=self._prompt_fn({"context": context, "question": question}))
+        parts = []
+        async for chunk in llm.astream([msg]):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {"token": chunk.content}
+
+        # Only complete answers are cached (a disconnected client stops the loop above)
+        result = {
+            "answer": "".join(parts),
+            "sources": sources,
+            "num_sources": len(sources),
+            "model": model
+        }
+        await asyncio.to_thread(
+            self._cache_store, query_vec, k, result, [doc.id for doc in relevant_docs]
         )
 
-        if not results or not results['ids']:
-            raise ValueError(f"No documents found for {filename}")
+    async def abatch_query(self, questions: List[str], k: int = 4,
+                           cache_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Answer several questions in one pass
 
-        # Delete the documents
-        collection.delete(ids=results['ids'])
+        1. One batched embedding forward pass for all questions
+        2. One GEMM of all question vectors against the index, MMR per row
+        3. LLM calls run concurrently (BATCH_LLM_CONCURRENCY at a time)
 
-        # Remove from loaded papers list
-        paper_name = filename.replace(".pdf", "")
-        if paper_name in self.loaded_papers:
-            self.loaded_papers.remove(paper_name)
+        Results are in question order; cached questions skip steps 2-3,
+        repeated questions in one batch are answered (and cached) once
+        A failed LLM call yields an empty answer with "error" set for that
+        question only; failures are not cached
+        """
+        if not self.vectorstore:
+            raise ValueError("No vector store loaded!")
 
-        remaining_count = collection.count()
+        threshold = SEMANTIC_CACHE_THRESHOLD if cache_threshold is None else cache_threshold
+        query_vecs, results, retrieved, first = await asyncio.to_thread(
+            self._batch_retrieve, questions, k, threshold
+        )
+
+        semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+        async def answer(question: str, relevant_docs: List[Document], max_sim: float):
+            context, sources = self._build_context(relevant_docs)
+            llm, model, _ = self._route_llm(question, max_sim)
+            async with semaphore:
+                msg = HumanMessage(content=self._prompt_fn({"context": context, "question": question}))
+                response = await llm.ainvoke([msg])
+            return {
+                "answer": response.content,
+                "sources": sources,
+                "num_sources": len(sources),
+                "model": model
+            }
+
+        misses = list(retrieved)
+        answers = await asyncio.gather(
+            *[answer(questions[i], *retrieved[i]) for i in misses],
+            return_exceptions=True
+        )
+        answered = []
+        for i, result in zip(misses, answers):
+            if isinstance(result, Exception):
+                logger.error("Batch question %d failed: %s", i, result, exc_info=result)
+                result = {"answer": "", "sources": [], "num_sources": 0, "model": None,
+                          "error": "Query processing failed"}
+            else:
+                answered.append(i)
+            results[i] = result
+
+        await asyncio.to_thread(
+            self._cache_store_many,
+            query_vecs[answered], k, [results[i] for i in answered],
+            [[doc.id for doc in retrieved[i][0]] for i in answered]
+        )
+        # Repeated questions share their first occurrence's result
+        return [results[j] for j in first]
+
+    def _batch_retrieve(self, questions: List[str], k: int, threshold: float):
+        """
+        Embed + cache lookup + retrieval for abatch_query (CPU-bound, runs in a thread)
+
+        Repeats (same question up to case/whitespace) are embedded, looked up
+        and answered once: first[i] is the index of question i's first occurrence
+
+        Returns (query_vecs, results with cache hits filled in, {index: (docs, max_sim)}
+        for the cache misses, first) - results/retrieved only cover first occurrences
+        """
+        seen: Dict[str, int] = {}
+        first = [seen.setdefault(" ".join(q.split()).casefold(), i) for i, q in enumerate(questions)]
+        unique = list(seen.values())
+
+        unique_vecs = np.asarray(self.embeddings.embed_documents([questions[i] for i in unique]),
+                                 dtype=np.float32)
+        query_vecs = np.empty((len(questions), unique_vecs.shape[1]), dtype=np.float32)
+        query_vecs[unique] = unique_vecs
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        for i, vec in zip(unique, unique_vecs):
+            results[i] = self._cache_lookup(vec, k, threshold)
+        misses = [i for i in unique if results[i] is None]
+
+        retrieved = {}
+        if misses:
+            hits = self._mmr_search_batch(query_vecs[misses], k=k, fetch_k=k * 3, lambda_mult=0.7)
+            retrieved = dict(zip(misses, hits))
+        return query_vecs, results, retrieved, first
+
+    @staticmethod
+    def _build_context(relevant_docs: List[Document]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Numbered context block for the prompt + source previews for the response"""
+        # List comprehension, not a generator: str.join builds a list from a
+        # generator first anyway, so the list is the cheaper input
+        context = "\n\n".join([
+            f"[Source {i}]: {doc.page_content}" for i, doc in enumerate(relevant_docs, 1)
+        ])
+        sources = [
+            {
+                "paper": doc.metadata.get("paper", "Unknown"),
+                "page": doc.metadata.get("page", "Unknown"),
+                "content_preview": doc.page_content[:200] + "..."
+            }
+            for doc in relevant_docs
+        ]
+        return context, sources
+    
+    def remove_file(self, filename: str) -> Dict[str, Any]:
+        """Remove all chunks from a specific file from the vector store"""
+        with self._mutation_lock:
+            if not self.vectorstore:
+                raise ValueError("No vector store loaded!")
+
+            # Chunk count from the in-memory index, read before the delete
+            # Why not count() before/after: a concurrent upload landing between
+            #     the two calls would be netted against the removal
+            # Why not get(where=): it would materialize every matching id in
+            #     Python just to send them straight back
+            removed = len(self._rows_by_source.get(filename, ()))
+            if removed == 0:
+                raise ValueError(f"No documents found for {filename}")
+
+            # Delete by metadata filter in one call
+            # Index + cache are updated right after, before anything that can fail
+            collection = self.vectorstore._collection
+            collection.delete(where={"source": filename})
+            self._remove_from_index(filename)
+            self._prune_cache()
+
+            # Remove from loaded papers set
+            self.loaded_papers.discard(filename.replace(".pdf", ""))
+            remaining_count = collection.count()
 
         return {
             "status": "success",
-            "removed_chunks": len(results['ids']),
+            "removed_chunks": removed,
             "remaining_chunks": remaining_count
         }
 
+    def loaded_files(self) -> List[str]:
+        """Filenames currently in the index"""
+        with self._index_lock:
+            return sorted(source for source in self._rows_by_source if source)
+
+    def reset(self) -> None:
+        """Delete every document (collection, in-memory index, answer cache)"""
+        # Same lock as uploads/removals: an upload finishing mid-reset would
+        # otherwise re-add rows to the index after the collection was dropped
+        with self._mutation_lock:
+            if self.vectorstore is not None:
+                self.vectorstore.delete_collection()
+                self.vectorstore = None
+            self._clear_index()
+            self.loaded_papers.clear()
+            self.clear_cache()
+
     def get_stats(self) -> Dict[str, Any]:
         if not self.vectorstore:
             return {"status": "No documents loaded"}
@@ -192,5 +958,8 @@ DETAILED ANSWER:""")
         collection = self.vectorstore._collection
         return {
             "total_chunks": collection.count(),
-            "loaded_papers": self.loaded_papers,
+            "loaded_papers": sorted(self.loaded_papers),
+            "cache_entries": int(np.count_nonzero(self._qcache_k[:self._qcache_n])),
+            "cache_hits": self._qcache_hits,
+            "cache_misses": self._qcache_misses,
         }
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Shared fixtures for the backend tests
+
+Run from backend/:  python -m pytest -q
+
+Nothing here touches the network: the BGE model is swapped for LangChain's
+deterministic fake embeddings and the Groq clients for FakeListChatModel
+"""
+
+import os
+import sys
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# api.py exits at import without a key
+os.environ.setdefault("GROQ_API_KEY", "gsk_" + "t" * 52)
+
+import rag_engine  # noqa: E402
+
+
+class NormalizedFakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic per-text vectors, unit length like the real BGE embeddings"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vecs = np.asarray(super().embed_documents(texts))
+        return (vecs / np.linalg.norm(vecs, axis=1, keepdims=True)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        vec = np.asarray(super().embed_query(text))
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+def fake_chat_groq(**kwargs):
+    """Stands in for ChatGroq: answers name the routed model"""
+    return FakeListChatModel(responses=[f"answer from {kwargs['model']} [Source 1]"])
+
+
+def _make_docs(n: int, files: int = 3) -> List[Document]:
+    """n chunks spread round-robin over `files` PDFs"""
+    return [
+        Document(
+            page_content=f"chunk {i} of file {i % files}: " + "lorem ipsum " * (i % 5),
+            metadata={"source": f"f{i % files}.pdf", "paper": f"f{i % files}", "page": i}
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def make_docs():
+    return _make_docs
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Fake embedding singleton + fake Groq clients for everything built in the test"""
+    monkeypatch.setattr(rag_engine, "_EMB_SINGLETON", NormalizedFakeEmbeddings(size=32))
+    monkeypatch.setattr(rag_engine, "ChatGroq", fake_chat_groq)
+
+
+@pytest.fixture
+def rag(fake_models, tmp_path):
+    """A PaperQA persisting into a fresh temporary directory"""
+    return rag_engine.PaperQA(groq_api_key="gsk_test", persist_directory=str(tmp_path))
+
+
+@pytest.fixture
+def client(fake_models, tmp_path, monkeypatch):
+    """TestClient over the full app (lifespan included), fresh store + rate limits"""
+    import api  # Here, not at the top: needs GROQ_API_KEY set above
+
+    monkeypatch.setattr(api, "CHROMA_PERSIST_DIR", str(tmp_path))
+    api.limiter.reset()
+    with TestClient(api.app) as c:
+        yield c
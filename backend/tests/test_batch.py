@@ -0,0 +1,87 @@
+"""/batch-query through the full app (TestClient)"""
+
+import pytest
+
+import api
+
+
+class EchoLLM:
+    """Answers with the question it was asked; 'explode' in a question fails the call"""
+
+    def __init__(self):
+        self.questions = []
+
+    def bind(self, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        question = messages[0].content.split("USER QUESTION: ", 1)[1].split("\n", 1)[0]
+        self.questions.append(question)
+        if "explode" in question:
+            raise RuntimeError("groq unavailable")
+        return type("Reply", (), {"content": f"echo: {question}"})()
+
+
+@pytest.fixture
+def llm(client, make_docs, monkeypatch):
+    rag = api.app.state.rag
+    rag.create_vectorstore(make_docs(30))
+    echo = EchoLLM()
+    monkeypatch.setattr(rag, "llm_fast", echo)
+    monkeypatch.setattr(rag, "llm_big", echo)
+    return echo
+
+
+def batch(client, questions, **extra):
+    return client.post("/batch-query", json={"questions": questions, "num_sources": 3, **extra})
+
+
+def test_results_keep_question_order(client, llm):
+    questions = [f"question number {i}?" for i in range(10)]
+    response = batch(client, questions)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["answer"] for result in results] == [f"echo: {q}" for q in questions]
+    assert all(result["error"] is None and result["num_sources"] == 3 for result in results)
+
+
+def test_repeats_are_answered_once(client, llm):
+    questions = ["What is in chunk 3?", "what is   in chunk 3?", "what is in chunk 4?"]
+    results = batch(client, questions).json()["results"]
+
+    assert len(llm.questions) == 2
+    assert results[0] == results[1]
+    assert api.app.state.rag.get_stats()["cache_entries"] == 2
+
+
+def test_failed_question_does_not_fail_the_batch(client, llm):
+    questions = ["please explode now", "a fine question", "another fine one"]
+    results = batch(client, questions).json()["results"]
+
+    assert results[0] == {"answer": "", "sources": [], "num_sources": 0, "model": None,
+                          "error": "Query processing failed"}
+    assert [result["answer"] for result in results[1:]] == ["echo: a fine question", "echo: another fine one"]
+
+    # Only the successes were cached: a retry asks the LLM about the failure alone
+    assert api.app.state.rag.get_stats()["cache_entries"] == 2
+    llm.questions.clear()
+    batch(client, questions)
+    assert llm.questions == ["please explode now"]
+
+
+def test_rate_limit_counts_questions(client, llm):
+    assert batch(client, [f"question number {i}?" for i in range(48)]).status_code == 200
+    assert batch(client, [f"other question {i}?" for i in range(12)]).status_code == 200
+    # 60 questions/minute used up, although only 2 of the 5 requests/minute were
+    assert batch(client, ["one more question?"]).status_code == 429
+
+
+def test_validation(client, llm):
+    assert batch(client, ["ok question?"] * 49).status_code == 422
+    assert batch(client, []).status_code == 422
+    assert batch(client, ["<script>x</script>"]).status_code == 422
+
+
+def test_requires_documents(client):
+    assert batch(client, ["any question?"]).status_code == 400
@@ -0,0 +1,83 @@
+"""_fast_split invariants: chunk size, overlap, coverage, separator priority"""
+
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from pdf_loader import CHUNK_OVERLAP, CHUNK_SIZE, _fast_split, split_documents
+
+
+def sample_text(seed: int, n_words: int = 3000) -> str:
+    """Random words with sentence, line and paragraph breaks mixed in"""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_words):
+        parts.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(1, 12))))
+        parts.append(rng.choices([" ", ". ", "\n", "\n\n"], weights=[85, 8, 5, 2])[0])
+    return "".join(parts)
+
+
+def spans(text, chunks):
+    """(start, end) of every chunk in text - chunks are stripped substrings in order"""
+    result, pos = [], 0
+    for chunk in chunks:
+        start = text.find(chunk, pos)
+        assert start != -1, "chunk is not a substring of the text (after the previous one)"
+        result.append((start, start + len(chunk)))
+        pos = start + 1
+    return result
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(CHUNK_SIZE, CHUNK_OVERLAP), (200, 50), (60, 10)])
+@pytest.mark.parametrize("seed", range(5))
+def test_invariants(seed, chunk_size, overlap):
+    text = sample_text(seed)
+    chunks = _fast_split(text, chunk_size, overlap)
+
+    assert all(0 < len(chunk) <= chunk_size for chunk in chunks)
+    assert all(chunk == chunk.strip() for chunk in chunks)
+
+    bounds = spans(text, chunks)
+    for (prev_start, prev_end), (start, _) in zip(bounds, bounds[1:]):
+        assert start > prev_start
+        assert prev_end - start <= overlap
+
+    # Nothing but whitespace is ever dropped
+    covered = [False] * len(text)
+    for start, end in bounds:
+        covered[start:end] = [True] * (end - start)
+    assert all(covered[i] for i, ch in enumerate(text) if not ch.isspace())
+
+
+def test_short_text_is_one_chunk():
+    assert _fast_split("  just one short page \n") == ["just one short page"]
+    assert _fast_split(" \n\n ") == []
+
+
+def test_hard_cut_without_separators():
+    rng = random.Random(0)
+    text = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(5000))
+    chunks = _fast_split(text, 1500, 300)
+    bounds = spans(text, chunks)
+    assert [len(chunk) for chunk in chunks[:-1]] == [1500] * (len(chunks) - 1)
+    assert all(prev_end - start == 300 for (_, prev_end), (start, _) in zip(bounds, bounds[1:]))
+    assert bounds[-1][1] == len(text)
+
+
+def test_prefers_paragraph_breaks():
+    paragraphs = [f"paragraph {i} " + "word " * 80 for i in range(12)]  # ~420 chars each
+    text = "\n\n".join(paragraphs)
+    chunks = _fast_split(text, 1500, 300)
+    assert len(chunks) > 1
+    for _, end in spans(text, chunks)[:-1]:
+        assert text[end:].startswith(" \n\n")  # Cut at a paragraph break, not mid-paragraph
+
+
+def test_split_documents_copies_metadata():
+    page = Document(page_content=sample_text(0, 1000), metadata={"source": "a.pdf", "page": 2})
+    chunks = split_documents([page])
+    assert len(chunks) > 1
+    assert all(chunk.metadata == {"source": "a.pdf", "page": 2} for chunk in chunks)
+    chunks[0].metadata["page"] = 99
+    assert chunks[1].metadata["page"] == 2
@@ -0,0 +1,103 @@
+"""In-memory index: incremental append, removal, compaction, restart"""
+
+import threading
+
+import numpy as np
+import pytest
+
+import rag_engine
+
+
+def live_ids(rag):
+    return [rag._ids[i] for i in np.flatnonzero(rag._alive[:rag._n])]
+
+
+def search_sources(rag, question, k=10):
+    vec = np.asarray(rag.embeddings.embed_query(question), dtype=np.float32)
+    docs, _ = rag._mmr_search(vec, k, 40, 0.7)
+    return {doc.metadata["source"] for doc in docs}
+
+
+def test_append_grows_without_reloading(rag, make_docs):
+    rag.create_vectorstore(make_docs(10))
+    first_rows = rag._emb_matrix[:10].copy()
+    rag.create_vectorstore(make_docs(5, files=1))
+
+    assert rag._n == 15
+    assert len(rag._emb_matrix) >= 15
+    np.testing.assert_array_equal(rag._emb_matrix[:10], first_rows)
+    # Rows are unit length (dot product = cosine)
+    np.testing.assert_allclose(np.linalg.norm(rag._emb_matrix[:15], axis=1), 1, rtol=1e-5)
+    assert live_ids(rag) == rag._ids
+    assert rag.vectorstore._collection.count() == 15
+
+
+def test_remove_marks_rows_dead(rag, make_docs):
+    rag.create_vectorstore(make_docs(30, files=3))
+
+    result = rag.remove_file("f0.pdf")
+
+    assert result == {"status": "success", "removed_chunks": 10, "remaining_chunks": 20}
+    assert rag._n == 30  # Not compacted yet: 20 live rows out of 30
+    assert int(rag._alive[:rag._n].sum()) == 20
+    assert "f0.pdf" not in rag.loaded_files()
+    assert "f0.pdf" not in search_sources(rag, "chunk 3 of file 0")
+
+
+def test_compacts_once_most_rows_are_dead(rag, make_docs):
+    rag.create_vectorstore(make_docs(30, files=3))
+    rag.remove_file("f0.pdf")
+    rag.remove_file("f1.pdf")
+
+    assert rag._n == 10
+    assert rag._alive[:rag._n].all()
+    assert rag._rows_by_source == {"f2.pdf": list(range(10))}
+    assert all(meta["source"] == "f2.pdf" for meta in rag._metas)
+    assert search_sources(rag, "chunk 2 of file 2") == {"f2.pdf"}
+
+    # Appending after a compaction keeps row bookkeeping consistent
+    rag.create_vectorstore(make_docs(3, files=1))
+    assert rag._rows_by_source["f0.pdf"] == [10, 11, 12]
+
+
+def test_remove_unknown_file(rag, make_docs):
+    rag.create_vectorstore(make_docs(6))
+    with pytest.raises(ValueError, match="No documents found"):
+        rag.remove_file("missing.pdf")
+    assert rag._n == 6
+
+
+def test_restart_rebuilds_index(rag, make_docs, tmp_path):
+    rag.create_vectorstore(make_docs(12, files=2))
+    rag.remove_file("f1.pdf")
+
+    reopened = rag_engine.PaperQA(groq_api_key="gsk_test", persist_directory=str(tmp_path))
+
+    assert sorted(reopened._ids) == sorted(live_ids(rag))
+    assert reopened.loaded_files() == ["f0.pdf"]
+    assert reopened.loaded_papers == {"f0"}
+
+
+def test_reset_clears_everything(rag, make_docs):
+    rag.create_vectorstore(make_docs(6))
+    rag.reset()
+    assert rag.vectorstore is None
+    assert rag._n == 0 and rag.loaded_files() == []
+
+
+def test_concurrent_upload_and_remove_stay_consistent(rag, make_docs):
+    rag.create_vectorstore(make_docs(30, files=3))
+    uploads = [make_docs(4, files=1) for _ in range(4)]
+    for i, docs in enumerate(uploads):
+        for doc in docs:
+            doc.metadata.update(source=f"new{i}.pdf", paper=f"new{i}")
+
+    threads = [threading.Thread(target=rag.create_vectorstore, args=(docs,)) for docs in uploads]
+    threads += [threading.Thread(target=rag.remove_file, args=(f"f{i}.pdf",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert rag.vectorstore._collection.count() == len(live_ids(rag)) == 16
+    assert rag.loaded_files() == [f"new{i}.pdf" for i in range(4)]
@@ -0,0 +1,44 @@
+"""In-memory MMR retrieval vs LangChain's Chroma MMR"""
+
+import numpy as np
+import pytest
+
+
+def embed(rag, text):
+    return np.asarray(rag.embeddings.embed_query(text), dtype=np.float32)
+
+
+@pytest.fixture
+def loaded_rag(rag, make_docs):
+    rag.create_vectorstore(make_docs(300))
+    return rag
+
+
+@pytest.mark.parametrize("k,fetch_k,lambda_mult", [(4, 12, 0.7), (6, 20, 0.5), (3, 10, 1.0)])
+def test_matches_chroma_mmr(loaded_rag, k, fetch_k, lambda_mult):
+    for i in range(20):
+        question = f"question number {i}"
+        ours, _ = loaded_rag._mmr_search(embed(loaded_rag, question), k, fetch_k, lambda_mult)
+        theirs = loaded_rag.vectorstore.max_marginal_relevance_search(
+            question, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+        )
+        assert [doc.id for doc in ours] == [doc.id for doc in theirs]
+        assert [doc.page_content for doc in ours] == [doc.page_content for doc in theirs]
+
+
+def test_max_sim_is_best_cosine(loaded_rag):
+    query_vec = embed(loaded_rag, "how many chunks?")
+    _, max_sim = loaded_rag._mmr_search(query_vec, 4, 12, 0.7)
+    n = loaded_rag._n
+    assert max_sim == pytest.approx(float((loaded_rag._emb_matrix[:n] @ query_vec).max()), abs=1e-5)
+
+
+def test_fetch_k_larger_than_index(rag, make_docs):
+    rag.create_vectorstore(make_docs(5))
+    docs, _ = rag._mmr_search(embed(rag, "anything"), 10, 50, 0.7)
+    assert len(docs) == 5
+    assert len({doc.id for doc in docs}) == 5
+
+
+def test_empty_index(rag):
+    assert rag._mmr_search(np.ones(32, dtype=np.float32), 4, 12, 0.7) == ([], 0.0)
@@ -0,0 +1,73 @@
+"""extract_pages routing (pypdfium2 -> pypdf fallback) and load_pdf_chunks errors"""
+
+import pytest
+from langchain_core.documents import Document
+
+import pdf_loader
+
+PAGE_TEXT = "readable text from the fallback parser " * 10
+
+
+class FakePyPDFLoader:
+    calls = []
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        FakePyPDFLoader.calls.append(self.path)
+        return [Document(page_content=PAGE_TEXT, metadata={"source": self.path, "page": 0})]
+
+
+@pytest.fixture(autouse=True)
+def fake_pypdf(monkeypatch):
+    FakePyPDFLoader.calls = []
+    monkeypatch.setattr(pdf_loader, "PyPDFLoader", FakePyPDFLoader)
+
+
+def test_pdfium_failure_falls_back_to_pypdf(monkeypatch):
+    def broken(path):
+        raise RuntimeError("pdfium cannot open this file")
+
+    monkeypatch.setattr(pdf_loader, "PDFIUM_AVAILABLE", True)
+    monkeypatch.setattr(pdf_loader, "_fast_extract", broken)
+
+    pages = pdf_loader.extract_pages("odd.pdf")
+
+    assert FakePyPDFLoader.calls == ["odd.pdf"]
+    assert pages[0].page_content == PAGE_TEXT
+
+
+def test_pdfium_text_skips_pypdf(monkeypatch):
+    monkeypatch.setattr(pdf_loader, "PDFIUM_AVAILABLE", True)
+    monkeypatch.setattr(pdf_loader, "_fast_extract",
+                        lambda path: [Document(page_content=PAGE_TEXT, metadata={"page": 0})])
+
+    pdf_loader.extract_pages("fine.pdf")
+
+    assert FakePyPDFLoader.calls == []
+
+
+def test_errors_keep_the_original_cause(tmp_path, monkeypatch):
+    path = tmp_path / "bad.pdf"
+    path.write_bytes(b"%PDF-1.7 not really")
+    cause = RuntimeError("both parsers failed")
+
+    def failing(pdf_path):
+        raise cause
+
+    monkeypatch.setattr(pdf_loader, "extract_pages", failing)
+    with pytest.raises(ValueError, match="bad.pdf: both parsers failed") as excinfo:
+        pdf_loader.load_pdf_chunks(str(path))
+    assert excinfo.value.__cause__ is cause
+
+
+def test_scanned_error_keeps_type_and_cause(tmp_path, monkeypatch):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.7")
+    monkeypatch.setattr(pdf_loader, "PDFIUM_AVAILABLE", False)
+    monkeypatch.setattr(FakePyPDFLoader, "load", lambda self: [Document(page_content="", metadata={})])
+
+    with pytest.raises(pdf_loader.ScannedPDFError, match="scan.pdf: no extractable text") as excinfo:
+        pdf_loader.load_pdf_chunks(str(path))
+    assert isinstance(excinfo.value.__cause__, pdf_loader.ScannedPDFError)
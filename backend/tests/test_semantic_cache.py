@@ -0,0 +1,111 @@
+"""Semantic answer cache: hits, invalidation, pruning, eviction, persistence"""
+
+import os
+
+import numpy as np
+import pytest
+
+import rag_engine
+
+
+def unit(seed, dim=32):
+    vec = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+@pytest.fixture
+def loaded_rag(rag, make_docs):
+    rag.create_vectorstore(make_docs(30))
+    return rag
+
+
+def test_repeat_question_hits(loaded_rag):
+    first = loaded_rag.query("what is in chunk 3?", k=3)
+    second = loaded_rag.query("what is in chunk 3?", k=3)
+    assert second == first
+    stats = loaded_rag.get_stats()
+    assert (stats["cache_hits"], stats["cache_misses"], stats["cache_entries"]) == (1, 1, 1)
+
+
+def test_num_sources_must_match(loaded_rag):
+    loaded_rag.query("what is in chunk 3?", k=3)
+    loaded_rag.query("what is in chunk 3?", k=2)
+    assert loaded_rag.get_stats()["cache_hits"] == 0
+
+
+def test_threshold(rag):
+    rag._cache_store(unit(0), 4, {"answer": "a"}, [])
+    near = unit(0) + 0.05 * unit(1)
+    sim = float(unit(0) @ (near / np.linalg.norm(near)))
+    assert rag._cache_lookup(near, 4, sim - 0.01) == {"answer": "a"}
+    assert rag._cache_lookup(near, 4, sim + 0.01) is None
+
+
+def test_upload_invalidates(loaded_rag, make_docs):
+    loaded_rag.query("what is in chunk 3?", k=3)
+    loaded_rag.create_vectorstore(make_docs(3, files=1))
+    assert loaded_rag.get_stats()["cache_entries"] == 0
+
+
+def test_remove_prunes_only_affected_answers(rag):
+    rag._append_to_index(["a1", "b1"], ["a", "b"], [{"source": "a.pdf"}, {"source": "b.pdf"}],
+                         np.stack([unit(10), unit(11)]))
+    rag._cache_store(unit(0), 4, {"answer": "cites a"}, ["a1"])
+    rag._cache_store(unit(1), 4, {"answer": "cites b"}, ["b1"])
+
+    rag._remove_from_index("a.pdf")
+    rag._prune_cache()
+
+    assert rag._cache_lookup(unit(0), 4, 0.99) is None
+    assert rag._cache_lookup(unit(1), 4, 0.99) == {"answer": "cites b"}
+    # The freed slot is reused before the buffer grows
+    rag._cache_store(unit(2), 4, {"answer": "new"}, [])
+    assert rag._qcache_n == 2
+
+
+def test_lru_eviction(rag, monkeypatch):
+    monkeypatch.setattr(rag_engine, "SEMANTIC_CACHE_MAX_ENTRIES", 3)
+    for i in range(3):
+        rag._cache_store(unit(i), 4, {"answer": i}, [])
+    assert rag._cache_lookup(unit(0), 4, 0.99) == {"answer": 0}  # 1 is now least recent
+
+    rag._cache_store(unit(3), 4, {"answer": 3}, [])
+
+    assert rag._qcache_n == 3
+    assert [rag._cache_lookup(unit(i), 4, 0.99) for i in range(4)] == [
+        {"answer": 0}, None, {"answer": 2}, {"answer": 3}
+    ]
+
+
+def test_saves_are_debounced(rag, monkeypatch, tmp_path):
+    monkeypatch.setattr(rag_engine, "CACHE_SAVE_INTERVAL", 3600)
+    rag._cache_store(unit(0), 4, {"answer": "a"}, [])
+    assert not (tmp_path / "query_cache.json").exists()
+
+    rag.save_cache()
+    assert (tmp_path / "query_cache.json").exists()
+
+
+def test_survives_restart(rag, tmp_path):
+    rag._cache_store(unit(0), 4, {"answer": "a"}, [])
+    rag._cache_store(unit(1), 2, {"answer": "b"}, [])
+    rag.save_cache()
+
+    reopened = rag_engine.PaperQA(groq_api_key="gsk_test", persist_directory=str(tmp_path))
+    assert reopened._cache_lookup(unit(0), 4, 0.99) == {"answer": "a"}
+    assert reopened._cache_lookup(unit(1), 2, 0.99) == {"answer": "b"}
+
+
+def test_restart_drops_answers_citing_missing_chunks(rag, tmp_path):
+    rag._cache_store(unit(0), 4, {"answer": "a"}, ["gone"])
+    rag.save_cache()
+
+    reopened = rag_engine.PaperQA(groq_api_key="gsk_test", persist_directory=str(tmp_path))
+    assert reopened._cache_lookup(unit(0), 4, 0.99) is None
+
+
+def test_clear_cache(rag, tmp_path):
+    rag._cache_store(unit(0), 4, {"answer": "a"}, [])
+    assert rag.clear_cache() == 1
+    assert rag._cache_lookup(unit(0), 4, 0.5) is None
+    assert os.path.getsize(tmp_path / "query_cache.json") == len("[]")
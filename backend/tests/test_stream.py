@@ -0,0 +1,80 @@
+"""/query/stream Server-Sent Events through the full app (TestClient)"""
+
+import json
+
+import pytest
+
+import api
+
+QUESTION = {"question": "what is in chunk 7 of file 1?", "num_sources": 3}
+
+
+@pytest.fixture
+def loaded_client(client, make_docs):
+    api.app.state.rag.create_vectorstore(make_docs(30))
+    return client
+
+
+def read_events(client, payload):
+    """POST to /query/stream; returns the response and its (event, data) pairs"""
+    with client.stream("POST", "/query/stream", json=payload) as response:
+        body = "".join(response.iter_text())
+    events = []
+    for block in filter(None, body.split("\n\n")):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return response, events
+
+
+def test_event_order(loaded_client):
+    response, events = read_events(loaded_client, QUESTION)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in response.headers  # Never gzipped
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"message"}
+
+    sources = events[0][1]
+    assert len(sources["sources"]) == 3
+    answer = "".join(data["token"] for kind, data in events if kind == "message")
+    assert answer == f"answer from {sources['model']} [Source 1]"
+
+
+def test_repeat_is_served_from_cache(loaded_client):
+    _, first = read_events(loaded_client, QUESTION)
+    _, second = read_events(loaded_client, QUESTION)
+
+    full_answer = "".join(data["token"] for kind, data in first if kind == "message")
+    assert second == [first[0], ("message", {"token": full_answer}), ("done", {})]
+    assert api.app.state.rag.get_stats()["cache_hits"] == 1
+
+
+def test_llm_failure_is_reported_in_band(loaded_client, monkeypatch):
+    class FailingLLM:
+        def bind(self, **kwargs):
+            return self
+
+        async def astream(self, messages):
+            raise RuntimeError("groq unavailable")
+            yield  # pragma: no cover - makes this an async generator
+
+    rag = api.app.state.rag
+    monkeypatch.setattr(rag, "llm_fast", FailingLLM())
+    monkeypatch.setattr(rag, "llm_big", FailingLLM())
+
+    response, events = read_events(loaded_client, QUESTION)
+    assert response.status_code == 200
+    assert events[0][0] == "sources"
+    assert events[-1] == ("error", {"detail": "Query processing failed"})
+    assert rag.get_stats()["cache_entries"] == 0
+
+
+def test_requires_documents(client):
+    assert client.post("/query/stream", json=QUESTION).status_code == 400
+
+
+def test_validates_question(loaded_client):
+    assert loaded_client.post("/query/stream", json={"question": "x"}).status_code == 422
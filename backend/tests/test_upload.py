@@ -0,0 +1,50 @@
+"""/upload: parse pool recovery after a worker dies"""
+
+import io
+import os
+
+import pypdfium2 as pdfium
+import pytest
+
+import api
+
+
+def crash_worker(pdf_path, filename):
+    """Stands in for load_pdf_chunks: kills the worker like a PDFium segfault"""
+    os._exit(1)
+
+
+def blank_pdf() -> bytes:
+    """One-page PDF without a text layer (rejected as scanned once parsed)"""
+    pdf = pdfium.PdfDocument.new()
+    pdf.new_page(200, 200)
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def upload(client, name):
+    response = client.post("/upload", files=[("files", (name, blank_pdf(), "application/pdf"))])
+    assert response.status_code == 200
+    return response.json()["errors"]
+
+
+@pytest.fixture
+def parse_pool(monkeypatch):
+    """Real spawn pool with one worker, shut down after the test"""
+    monkeypatch.setattr(api, "PARSE_WORKERS", 1)
+    monkeypatch.setattr(api, "_parse_pool", None)
+    yield
+    if api._parse_pool is not None:
+        api._parse_pool.shutdown()
+
+
+def test_dead_worker_fails_only_that_upload(client, parse_pool, monkeypatch):
+    real_loader = api.load_pdf_chunks
+    monkeypatch.setattr(api, "load_pdf_chunks", crash_worker)
+    assert upload(client, "crash.pdf") == ["crash.pdf: Failed to process"]
+    assert api._parse_pool is None  # Dropped, rebuilt on the next upload
+
+    monkeypatch.setattr(api, "load_pdf_chunks", real_loader)
+    assert upload(client, "blank.pdf") == ["blank.pdf: No extractable text (scanned PDF?) - skipped"]
+    assert api._parse_pool is not None
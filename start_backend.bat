@@ -1,5 +1,7 @@
 @echo off
 echo Starting backend...
+rem UTF-8 stdio: non-ASCII filenames in log lines on legacy code page consoles
+set PYTHONUTF8=1
 cd backend
 python api.py
 pause